@@ -3,17 +3,24 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+import atexit
+import hashlib
+import queue
 import re
+import shutil
 import tempfile
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 
-from main import grade_from_db
 from database.question_loader import list_available_questions
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+_COPY_CHUNK = 1024 * 1024
+
 def _parse_pages(page_str: str) -> list[int]:
     if not page_str.strip():
         return []
@@ -49,28 +56,83 @@ def _extract_question_number(title: str) -> str:
     return match.group(1) if match else ""
 
 
-def _save_file(uploaded_file, temp_dir: str) -> str:
+def _save_file(uploaded_file, temp_dir: str, digest: str) -> str:
+    """Write the upload under a content-hashed name, skipping unchanged files."""
     os.makedirs(temp_dir, exist_ok=True)
-    path = os.path.join(temp_dir, uploaded_file.name)
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    stem, ext = os.path.splitext(uploaded_file.name)
+    path = os.path.join(temp_dir, f"{stem}_{digest[:8]}{ext}")
+    if os.path.exists(path):
+        return path
+    # The directory is shared across sessions: write to a private temp file
+    # and rename it into place, so a concurrent session or a failed write can
+    # never leave a truncated PDF at the final path.
+    uploaded_file.seek(0)
+    fd, tmp = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb", buffering=_COPY_CHUNK) as f:
+            shutil.copyfileobj(uploaded_file, f, length=_COPY_CHUNK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
     return path
 
 
+def _file_sha1(uploaded_file) -> str:
+    """Content hash of an upload, read in chunks without buffering it whole."""
+    digest = hashlib.sha1()
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(_COPY_CHUNK), b""):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _run_pipeline(grade_fn, progress, status, updates: queue.Queue, **kwargs):
+    """Run *grade_fn* in a worker thread, mirroring its stage updates in the UI.
+
+    The pipeline runs off the script thread; stage updates arrive through
+    *updates* and are drained into the progress bar and the status label.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(
+            grade_fn,
+            progress_cb=lambda pct, msg: updates.put((pct, msg)),
+            **kwargs,
+        )
+        while not future.done() or not updates.empty():
+            try:
+                pct, msg = updates.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            progress.progress(pct)
+            status.update(label=msg)
+        return future.result()
+
+
 @st.cache_data(ttl=60)
 def _load_questions() -> list[dict]:
     return list_available_questions()
 
 
+@st.cache_resource
+def _session_tempdir() -> str:
+    """One upload directory per server process, removed on interpreter exit."""
+    path = tempfile.mkdtemp(prefix="exam_grader_")
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
 # ── Main UI ───────────────────────────────────────────────────────────────────
 
 def main():
     st.set_page_config(page_title="Exam Grader", page_icon="📚", layout="wide")
     st.title("📚 Automated Exam Grader")
 
-    if "temp_dir" not in st.session_state:
-        st.session_state.temp_dir = tempfile.mkdtemp(prefix="exam_grader_")
-    temp_dir = st.session_state.temp_dir
+    temp_dir = _session_tempdir()
 
     # ── Load questions from MongoDB ──────────────────────────────────────────
     try:
@@ -128,6 +190,15 @@ def main():
                 "ethics, internal control."
             ),
         ) or "numerical"
+        force_regrade = st.checkbox(
+            "Re-grade even if unchanged",
+            value=False,
+            help=(
+                "By default, grading the same PDF with the same settings again in "
+                "this session reuses the earlier result instead of re-running the "
+                "LLM pipeline."
+            ),
+        )
 
     # ── Grade ────────────────────────────────────────────────────────────────
     if st.button("Grade Student", type="primary"):
@@ -145,52 +216,79 @@ def main():
             st.error("Please enter the question number the student is answering.")
             st.stop()
 
-        model_answers_id = selected["_id"]
-
-        os.makedirs(output_dir, exist_ok=True)
-        student_path = _save_file(student_pdf, temp_dir)
+        # Imported here so the extraction/grading/annotation stack (fitz,
+        # LangChain, provider SDKs) only loads once a grading run is requested,
+        # not on every widget rerun.
+        from main import grade_from_db
 
-        progress = st.progress(0)
-        status = st.empty()
+        model_answers_id = selected["_id"]
 
-        try:
-            status.info("Extracting student answers, grading and annotating...")
-            progress.progress(20)
-
-            ok, message, annotated_path = grade_from_db(
-                model_answers_id=model_answers_id,
-                student_pdf_path=student_path,
-                student_pages=student_pages,
-                student_name=student_name,
-                output_dir=output_dir,
-                question_num=question_num,
-                question_type=question_type,
-            )
-            progress.progress(100)
-
-            if ok:
-                status.success("Grading complete!")
-                st.success(message)
-                if annotated_path and os.path.exists(annotated_path):
-                    with open(annotated_path, "rb") as f:
-                        st.download_button(
-                            "Download Annotated PDF",
-                            f.read(),
-                            file_name=f"{student_name}_annotated.pdf",
-                            mime="application/pdf",
-                        )
+        # Identical PDF + settings → reuse this session's earlier result.
+        pdf_digest = _file_sha1(student_pdf)
+        run_key = (
+            pdf_digest, tuple(student_pages), student_name,
+            question_num, question_type, str(model_answers_id), output_dir,
+        )
+        past_results: dict = st.session_state.setdefault("grading_results", {})
+        cached = None if force_regrade else past_results.get(run_key)
+        if cached and not (cached[2] and os.path.exists(cached[2])):
+            cached = None
+
+        updates: queue.Queue = queue.Queue()
+        ok, message, annotated_path = False, "", None
+
+        # One st.status container holds the progress bar and stage label so
+        # each stage update is a single delta to the browser.
+        with st.status("Grading student...", expanded=True) as status:
+            progress = st.progress(0)
+            try:
+                if cached:
+                    ok, message, annotated_path = cached
+                    status.update(
+                        label="Reused the result of an earlier run with identical inputs.",
+                        state="complete",
+                    )
                 else:
-                    st.warning("Grading succeeded but annotated PDF not found.")
-                    if annotated_path:
-                        st.caption(f"Expected path: {annotated_path}")
+                    os.makedirs(output_dir, exist_ok=True)
+                    student_path = _save_file(student_pdf, temp_dir, pdf_digest)
+                    status.update(label="Extracting student answers, grading and annotating...")
+                    ok, message, annotated_path = _run_pipeline(
+                        grade_from_db, progress, status, updates,
+                        model_answers_id=model_answers_id,
+                        student_pdf_path=student_path,
+                        student_pages=student_pages,
+                        student_name=student_name,
+                        output_dir=output_dir,
+                        question_num=question_num,
+                        question_type=question_type,
+                        refresh_cache=force_regrade,
+                    )
+                    if ok:
+                        past_results[run_key] = (ok, message, annotated_path)
+                    status.update(
+                        label="Grading complete!" if ok else f"Failed: {message}",
+                        state="complete" if ok else "error",
+                    )
+                progress.progress(100)
+            except Exception as e:
+                status.update(label=f"Unexpected error: {e}", state="error")
+                st.code(traceback.format_exc())
+                st.stop()
+
+        if ok:
+            st.success(message)
+            if annotated_path and os.path.exists(annotated_path):
+                with open(annotated_path, "rb") as f:
+                    st.download_button(
+                        "Download Annotated PDF",
+                        data=f,
+                        file_name=f"{student_name}_annotated.pdf",
+                        mime="application/pdf",
+                    )
             else:
-                status.error(f"Failed: {message}")
-
-        except Exception as e:
-            status.error(f"Unexpected error: {e}")
-            st.code(traceback.format_exc())
-            progress.empty()
-
+                st.warning("Grading succeeded but annotated PDF not found.")
+                if annotated_path:
+                    st.caption(f"Expected path: {annotated_path}")
 
 if __name__ == "__main__":
     main()
@@ -9,7 +9,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 import asyncio
-from typing import Tuple, Optional, List, Literal
+from typing import Callable, Tuple, Optional, List, Literal
 from datetime import datetime
 import nest_asyncio
 
@@ -17,12 +17,50 @@ nest_asyncio.apply()
 
 from logging_config import logger
 from extraction.student_assignment_extraction import extract_assignment_pipeline
-from grading.grade import grade_student
+from grading.grade import GradingSession, grade_student, prepare_grading_session
 from annotation.annotator import annotate_pdf
 from errors import classify_error
 
 
 QuestionType = Literal["numerical", "theoretical"]
+ProgressCallback = Callable[[int, str], None]
+
+
+def _report(progress_cb: Optional[ProgressCallback], pct: int, message: str) -> None:
+    """Forward a stage update to *progress_cb*; never let the UI break grading."""
+    if progress_cb is None:
+        return
+    try:
+        progress_cb(pct, message)
+    except Exception as e:
+        logger.debug(f"Progress callback failed: {e}")
+
+
+def _run_in_fresh_loop(coro):
+    """Run *coro* to completion on a new event loop, then close that loop.
+
+    Streamlit calls in from a new worker thread on every run; nest_asyncio's
+    patched asyncio.run never closes the loop it installs, leaking the loop
+    and its default executor each time.  When the thread already runs a loop
+    (nested use), fall back to the patched asyncio.run.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        return asyncio.run(coro)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
 
 
 async def _extract_student_async(
@@ -30,6 +68,7 @@ async def _extract_student_async(
     pages: List[int],
     student_name: str,
     question_num: str,
+    refresh_cache: bool = False,
 ) -> Tuple[bool, Optional[str]]:
     loop = asyncio.get_running_loop()
     try:
@@ -41,6 +80,7 @@ async def _extract_student_async(
                 pages=pages,
                 student_name=student_name,
                 question_number=question_num,
+                refresh_cache=refresh_cache,
             )
         )
         if not doc_id:
@@ -62,9 +102,17 @@ async def grade_from_db_async(
     output_dir: str,
     question_num: str,
     question_type: str = "numerical",
+    progress_cb: Optional[ProgressCallback] = None,
+    session: Optional[GradingSession] = None,
+    refresh_cache: bool = False,
 ) -> Tuple[bool, str, Optional[str]]:
     """Grade a student PDF using a pre-saved model answer from MongoDB.
 
+    *progress_cb*, when given, is called as ``progress_cb(percent, message)``
+    as each pipeline stage starts.  *session* shares the model answer across
+    a batch (see grade_many_from_db_async).  *refresh_cache* skips the on-disk
+    LLM cache so extraction and grading get fresh answers.
+
     Returns (success, message, annotated_pdf_path).
     """
     start_time = datetime.now()
@@ -73,12 +121,14 @@ async def grade_from_db_async(
     logger.info(f"  model_answers_id={model_answers_id}")
     logger.info("=" * 70)
 
+    _report(progress_cb, 10, "Extracting student answers...")
     s_ok, student_answers_id = await _extract_student_async(
-        student_pdf_path, student_pages, student_name, question_num
+        student_pdf_path, student_pages, student_name, question_num, refresh_cache
     )
     if not s_ok or not student_answers_id:
         return False, "Student answer extraction failed", None
 
+    _report(progress_cb, 40, "Grading against the model answer...")
     loop = asyncio.get_running_loop()
     try:
         grades_id = await loop.run_in_executor(
@@ -90,6 +140,8 @@ async def grade_from_db_async(
                 model_answers_id=model_answers_id,
                 student_answers_id=student_answers_id,
                 question_type=question_type,
+                session=session,
+                refresh_cache=refresh_cache,
             )
         )
     except Exception as e:
@@ -100,13 +152,19 @@ async def grade_from_db_async(
     if not grades_id:
         return False, "Grading returned no result", None
 
+    _report(progress_cb, 75, "Annotating student PDF...")
     try:
-        annotation_ok, annotated_pdf = annotate_pdf(
-            input_pdf_path=student_pdf_path,
-            output_dir=output_dir,
-            student_name=student_name,
-            grades_id=grades_id,
-            student_pages=student_pages,
+        # Off the loop so other students' LLM and Mongo stages keep running;
+        # annotate_pdf serialises its PyMuPDF work under MUPDF_LOCK.
+        annotation_ok, annotated_pdf = await loop.run_in_executor(
+            None,
+            lambda: annotate_pdf(
+                input_pdf_path=student_pdf_path,
+                output_dir=output_dir,
+                student_name=student_name,
+                grades_id=grades_id,
+                student_pages=student_pages,
+            )
         )
     except Exception as e:
         clean_msg, show_tb = classify_error(e)
@@ -119,6 +177,7 @@ async def grade_from_db_async(
     logger.info("=" * 70 + "\n")
 
     msg = "Grading and annotation complete" if annotation_ok else "Annotation failed"
+    _report(progress_cb, 100, msg)
     return annotation_ok, msg, annotated_pdf
 
 
@@ -130,9 +189,15 @@ def grade_from_db(
     output_dir: str,
     question_num: str,
     question_type: str = "numerical",
+    progress_cb: Optional[ProgressCallback] = None,
+    refresh_cache: bool = False,
 ) -> Tuple[bool, str, Optional[str]]:
-    """Sync entry point for the production grading pipeline."""
-    return asyncio.run(
+    """Sync entry point for the production grading pipeline.
+
+    Safe to call from a worker thread: the run gets its own event loop, which
+    is closed (with its default executor) afterwards.
+    """
+    return _run_in_fresh_loop(
         grade_from_db_async(
             model_answers_id=model_answers_id,
             student_pdf_path=student_pdf_path,
@@ -141,5 +206,47 @@ def grade_from_db(
             output_dir=output_dir,
             question_num=question_num,
             question_type=question_type,
+            progress_cb=progress_cb,
+            refresh_cache=refresh_cache,
         )
     )
+
+
+async def grade_many_from_db_async(
+    jobs: List[dict],
+    concurrency: int = 8,
+) -> List[Tuple[bool, str, Optional[str]]]:
+    """Run grade_from_db_async for several students concurrently.
+
+    Each job holds grade_from_db_async() keyword arguments.  Every stage is
+    I/O-bound (LLM round trips, Mongo), so students overlap on the event loop;
+    *concurrency* caps how many are in flight to respect provider rate limits.
+    Jobs sharing a model answer share one GradingSession.  Results are in job
+    order, and one failed student never aborts the rest.
+    """
+    if not jobs:
+        return []
+
+    loop = asyncio.get_running_loop()
+    sessions: dict[str, GradingSession] = {}
+    for job in jobs:
+        ma_id = job.get("model_answers_id")
+        if ma_id and ma_id not in sessions:
+            sessions[ma_id] = await loop.run_in_executor(
+                None, lambda ma_id=ma_id: prepare_grading_session(None, ma_id)
+            )
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(job: dict) -> Tuple[bool, str, Optional[str]]:
+        async with sem:
+            try:
+                return await grade_from_db_async(
+                    **{"session": sessions.get(job.get("model_answers_id")), **job}
+                )
+            except Exception as e:
+                clean_msg, show_tb = classify_error(e)
+                logger.error(f"[Batch] {job.get('student_name')}: {clean_msg}", exc_info=show_tb)
+                return False, clean_msg, None
+
+    return list(await asyncio.gather(*(_one(job) for job in jobs)))
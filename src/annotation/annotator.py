@@ -15,9 +15,13 @@
 #           the correct student answer — never on a separate line.
 
 import json
+import logging
 import os
 import re
-from datetime import datetime
+import shutil
+import string
+import tempfile
+import time
 from typing import List, Optional, Tuple
 
 import fitz
@@ -25,8 +29,13 @@ from bson import ObjectId
 
 from logging_config import logger
 from database.mongodb import get_collection
+from utils.mupdf_lock import MUPDF_LOCK
 
-from .annotator_ocr import _init_ocr_cache, _page_search, _page_text, _page_words
+from .annotator_ocr import (
+    _init_ocr_cache, _warm_page_caches, _release_page_caches,
+    _load_page, _page_search, _page_text, _page_words, _page_size,
+    _page_shape, _commit_page_shapes,
+)
 from .annotator_text import (
     _normalize_text_for_match, _strip_llm_artifacts,
     _tokenize, _line_key, _build_anchor_variations, _build_candidate_fragments,
@@ -36,8 +45,29 @@ from .annotator_match import resolve_anchor_rect, _rank_pages_for_anchor
 from .annotator_draw import (
     _safe_float, _fmt_mark_value, _place_score_label,
     _place_ticks, place_score_near_anchor, add_main_score, add_popup_for_comment,
-    place_not_required_marker, compute_subq_y_bounds, _strip_subq_prefix,
+    place_not_required_marker, compute_subq_y_bounds, _presplit_comment,
+)
+
+
+_EVIDENCE_SPLIT_RE = re.compile(r"\s*;\s*")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+# ASCII-only equivalent of _NON_ALNUM_RE.sub("", ...) for str.translate.
+_ASCII_NON_ALNUM_TABLE = str.maketrans(
+    "", "",
+    "".join(c for c in map(chr, range(128)) if c not in string.ascii_lowercase + string.digits),
 )
+_YEAR_KEY_RE = re.compile(r"20x\d|20\d{2}")
+_FRACTION_RE = re.compile(r"\d+\s*/\s*\d+")
+_DIGIT_RE = re.compile(r"\d")
+_OF_MARK_RE = re.compile(r'^OF[\s\-–]', re.IGNORECASE)
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w.-]+")
+
+# Fields of a student_grades document that annotation reads.
+_GRADES_PROJECTION = dict.fromkeys((
+    "breakdown", "comments", "question_number", "student_answer_id",
+    "total_marks_awarded", "total_max_possible", "holistic_grading",
+    "not_required_points",
+), 1)
 
 
 # ── Main annotation function ───────────────────────────────────────────────────
@@ -52,46 +82,100 @@ def annotate_pdf(
 ) -> Tuple[bool, str]:
     """Annotate a student PDF with scores, underlines, tick marks, and feedback.
 
+    The grading document is fetched first; the PyMuPDF work then runs under
+    MUPDF_LOCK, so concurrent callers annotate one PDF at a time.
+
     Returns (success, output_pdf_path).
     """
+    # ── Load grading document ──────────────────────────────────────────────────
+    if grades_doc is None:
+        if not grades_id:
+            logger.error("No grades provided (need grades_id or grades_doc)")
+            return False, ""
+        try:
+            grades_coll = get_collection("student_grades")
+            grades_doc = grades_coll.find_one({"_id": ObjectId(grades_id)}, _GRADES_PROJECTION)
+        except Exception as e:
+            logger.error(f"Annotation failed for {student_name}: {e}", exc_info=True)
+            return False, ""
+        if not grades_doc:
+            logger.error(f"No grades for _id={grades_id}")
+            return False, ""
+
+    with MUPDF_LOCK:
+        return _annotate_loaded_pdf(input_pdf_path, output_dir, student_name, grades_doc, student_pages)
+
+
+def _annotate_loaded_pdf(
+    input_pdf_path: str,
+    output_dir: str,
+    student_name: str,
+    grades_doc: dict,
+    student_pages: Optional[List[int]],
+) -> Tuple[bool, str]:
+    """annotate_pdf() body once the grading document is loaded; caller holds MUPDF_LOCK."""
+    doc = None
+    work_pdf = ""
     try:
         student_key = student_name.lower().replace(" ", "_")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_pdf = os.path.join(
-            output_dir, student_key, f"{student_key}_annotated_{timestamp}.pdf"
-        )
-        mapping_json = os.path.join(
-            output_dir, student_key, f"{student_key}_mapping_{timestamp}.json"
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        student_dir = os.path.join(output_dir, student_key)
+        # Question number and grades id keep runs for different questions
+        # (or re-grades) of the same student apart within the same second.
+        run_tag = "_".join(
+            _UNSAFE_FILENAME_RE.sub("-", str(part)).strip("-")
+            for part in (
+                f"q{grades_doc.get('question_number', '')}",
+                timestamp,
+                str(grades_doc.get("_id") or "")[-8:],
+            )
+            if part
         )
-        os.makedirs(os.path.dirname(output_pdf), exist_ok=True)
+        output_pdf = os.path.join(student_dir, f"{student_key}_annotated_{run_tag}.pdf")
+        mapping_json = os.path.join(student_dir, f"{student_key}_mapping_{run_tag}.json")
+        os.makedirs(student_dir, exist_ok=True)
 
-        # ── Load grading document ──────────────────────────────────────────────
-        if grades_doc is None:
-            if not grades_id:
-                logger.error("No grades provided (need grades_id or grades_doc)")
-                return False, ""
-            grades_coll = get_collection("student_grades")
-            grades_doc = grades_coll.find_one({"_id": ObjectId(grades_id)})
-            if not grades_doc:
-                logger.error(f"No grades for _id={grades_id}")
-                return False, ""
-
-        total_breakdown = len(grades_doc.get('breakdown', []) or [])
-        displayed_count = len(
-            [it for it in (grades_doc.get('breakdown', []) or [])
-             if float(it.get('marks_awarded', 0) or 0) > 0]
-        )
+        # Filter the displayed criteria once; both the log line and the
+        # annotation loops below read from this list.
+        breakdown = grades_doc.get('breakdown', []) or []
+        displayed_breakdown = [
+            it for it in breakdown
+            if float(it.get('marks_awarded', 0) or 0) > 0
+            or "Marks given above" in str(it.get('reason', '') or '')
+            or "Marks given below" in str(it.get('reason', '') or '')
+        ]
         logger.info(
             f"Annotating {student_name} Q{grades_doc.get('question_number', '?')} "
-            f"({displayed_count} displayed / {total_breakdown} total criteria)"
+            f"({len(displayed_breakdown)} displayed / {len(breakdown)} total criteria)"
         )
 
-        doc = fitz.open(input_pdf_path)
-        allowed_pages = student_pages or list(range(1, len(doc) + 1))
+        # Work on a copy next to the output path so the result can be written
+        # as an incremental update appended to the original bytes; it is only
+        # renamed to output_pdf once annotation and save have succeeded.
+        # mkstemp gives every run its own work file, even for the same student.
+        fd, work_pdf = tempfile.mkstemp(dir=student_dir, suffix=".part")
+        os.close(fd)
+        shutil.copyfile(input_pdf_path, work_pdf)
+        doc = fitz.open(work_pdf)
+        # Restrict every pass to the student's own pages: drop duplicates and
+        # numbers outside the document, keeping the caller's order.
+        page_count = len(doc)
+        allowed_pages = [
+            p for p in dict.fromkeys(student_pages or [])
+            if isinstance(p, int) and 1 <= p <= page_count
+        ]
+        if student_pages and len(allowed_pages) != len(student_pages):
+            logger.warning(
+                f"Ignoring invalid/duplicate student pages: requested {student_pages}, "
+                f"using {allowed_pages} of {page_count}"
+            )
+        if not allowed_pages:
+            allowed_pages = list(range(1, page_count + 1))
 
         # OCR must be initialised BEFORE boundary detection so _page_search
         # can read text from scanned pages when locating question headings.
         _init_ocr_cache(doc, allowed_pages)
+        _warm_page_caches(doc, allowed_pages)
 
         # ── Fetch student assignment doc ───────────────────────────────────────
         page_token_sets: dict[int, set[str]] = {}
@@ -101,7 +185,10 @@ def annotate_pdf(
             student_answer_id = grades_doc.get('student_answer_id')
             if student_answer_id:
                 s_coll = get_collection("student_assignments")
-                s_doc = s_coll.find_one({"_id": ObjectId(student_answer_id)})
+                s_doc = s_coll.find_one(
+                    {"_id": ObjectId(student_answer_id)},
+                    {"question_heading_text": 1, "page_texts": 1},
+                )
                 if s_doc:
                     student_question_heading = s_doc.get("question_heading_text") or None
                     if isinstance(s_doc.get("page_texts"), list):
@@ -134,8 +221,45 @@ def annotate_pdf(
                 f"Question {q_num}",
             ]
 
+            # Next-question heading templates → max_y.
+            # STRICT criteria to avoid false positives from inline text:
+            #   • x0 < 100  — heading must be at the far left margin
+            #   • y0 must be genuinely below the current question's start
+            # We deliberately exclude the ambiguous "Question N" template
+            # because students write it inline ("As in Question 3…").
+            # We also only use the student_prefix template when the prefix
+            # is specific enough (len ≥ 2) — a bare prefix like "" would
+            # generate template "3" matching every digit on the page.
+            # The templates depend only on the question, so they are built
+            # once here rather than for every page.
+            try:
+                q_int = int(q_num)
+                neighbor_nums = [n for n in range(1, 11) if n != q_int]
+            except ValueError:
+                neighbor_nums = []
+
+            student_prefix: Optional[str] = None
+            student_suffix: Optional[str] = None
+            if student_question_heading and q_num in student_question_heading:
+                idx = student_question_heading.find(q_num)
+                student_prefix = student_question_heading[:idx]
+                student_suffix = student_question_heading[idx + len(q_num):]
+
+            neighbour_templates: list[tuple[int, str]] = []
+            for n in neighbor_nums:
+                templates = [
+                    f"ANSWER {n}", f"Answer {n}",
+                    f"ANSWER: {n}", f"Answer: {n}",
+                    f"Q-{str(n).zfill(2)}", f"Q.{n}", f"Q{n} ",
+                ]
+                # Only include the student-format template when the prefix is
+                # non-trivially specific (prevents bare-digit templates like "3").
+                if student_prefix and len(student_prefix.strip()) >= 2:
+                    templates.insert(0, f"{student_prefix}{n}{student_suffix}")
+                neighbour_templates.extend((n, tmpl) for tmpl in templates)
+
             for page_num in allowed_pages:
-                page = doc[page_num - 1]
+                page = _load_page(doc, page_num)
 
                 # Find this question's heading → min_y
                 for pattern in q_heading_patterns:
@@ -151,53 +275,20 @@ def annotate_pdf(
                         break
 
                 # Find next question's heading → max_y
-                # STRICT criteria to avoid false positives from inline text:
-                #   • x0 < 100  — heading must be at the far left margin
-                #   • y0 must be genuinely below the current question's start
-                # We deliberately exclude the ambiguous "Question N" template
-                # because students write it inline ("As in Question 3…").
-                # We also only use the student_prefix template when the prefix
-                # is specific enough (len ≥ 2) — a bare prefix like "" would
-                # generate template "3" matching every digit on the page.
                 current_min = min_y_per_page.get(page_num, 0)
                 best_next_y = float('inf')
 
-                try:
-                    q_int = int(q_num)
-                    neighbor_nums = [n for n in range(1, 11) if n != q_int]
-                except ValueError:
-                    neighbor_nums = []
-
-                student_prefix: Optional[str] = None
-                student_suffix: Optional[str] = None
-                if student_question_heading and q_num in student_question_heading:
-                    idx = student_question_heading.find(q_num)
-                    student_prefix = student_question_heading[:idx]
-                    student_suffix = student_question_heading[idx + len(q_num):]
-
-                for n in neighbor_nums:
-                    neighbour_templates = [
-                        f"ANSWER {n}", f"Answer {n}",
-                        f"ANSWER: {n}", f"Answer: {n}",
-                        f"Q-{str(n).zfill(2)}", f"Q.{n}", f"Q{n} ",
-                    ]
-                    # Only include the student-format template when the prefix is
-                    # non-trivially specific (prevents bare-digit templates like "3").
-                    if student_prefix and len(student_prefix.strip()) >= 2:
-                        neighbour_templates.insert(
-                            0, f"{student_prefix}{n}{student_suffix}"
-                        )
-                    for tmpl in neighbour_templates:
-                        hits = _page_search(page, tmpl)
-                        for hit in (hits or []):
-                            # x0 < 100: only accept hits at the very left margin
-                            if hit.x0 < 100 and hit.y0 > current_min + 30:
-                                if hit.y0 < best_next_y:
-                                    best_next_y = hit.y0
-                                    logger.debug(
-                                        f"  Neighbor Q{n} '{tmpl}' found on page {page_num}"
-                                        f" at y={hit.y0:.0f} x={hit.x0:.0f}"
-                                    )
+                for n, tmpl in neighbour_templates:
+                    hits = _page_search(page, tmpl)
+                    for hit in (hits or []):
+                        # x0 < 100: only accept hits at the very left margin
+                        if hit.x0 < 100 and hit.y0 > current_min + 30:
+                            if hit.y0 < best_next_y:
+                                best_next_y = hit.y0
+                                logger.debug(
+                                    f"  Neighbor Q{n} '{tmpl}' found on page {page_num}"
+                                    f" at y={hit.y0:.0f} x={hit.x0:.0f}"
+                                )
 
                 if best_next_y < float('inf'):
                     max_y_per_page[page_num] = best_next_y - 5
@@ -210,7 +301,7 @@ def annotate_pdf(
             page_text = student_page_texts.get(p, "")
             if not page_text:
                 try:
-                    page_text = _page_text(doc[p - 1])
+                    page_text = _page_text(_load_page(doc, p))
                 except Exception:
                     page_text = ""
             page_token_sets[p] = set(_tokenize(page_text or ""))
@@ -220,7 +311,7 @@ def annotate_pdf(
         comment_used_y: dict[int, list[float]] = {}
         ocr_textpages: dict[int, object] = {}
 
-        placed_lines_per_page = {i - 1: [] for i in allowed_pages}
+        placed_lines_per_page: dict[int, dict[int, list]] = {}
         placed_marks: set = set()
         line_score_accumulator: dict = {}
         unplaced_items: list = []
@@ -228,8 +319,8 @@ def annotate_pdf(
         annotation_mapping = {
             'total_score_placed': False,
             'criterion_scores_placed': 0,
-            'total_criteria': len(grades_doc.get('breakdown', [])),
-            'total_breakdown': len(grades_doc.get('breakdown', []) or []),
+            'total_criteria': len(breakdown),
+            'total_breakdown': len(breakdown),
             'comments_placed': 0,
             'unplaced_items': [],
             'allowed_pages': allowed_pages,
@@ -248,14 +339,7 @@ def annotate_pdf(
             annotation_mapping['total_score_placed'] = True
 
         # ── Per-criterion annotation ───────────────────────────────────────────
-        breakdown = grades_doc.get('breakdown', [])
         is_holistic = grades_doc.get('holistic_grading', False)
-        displayed_breakdown = [
-            it for it in breakdown
-            if float(it.get('marks_awarded', 0) or 0) > 0
-            or "Marks given above" in str(it.get('reason', '') or '')
-            or "Marks given below" in str(it.get('reason', '') or '')
-        ]
         annotation_mapping['total_criteria'] = len(displayed_breakdown)
         criteria_count = 0
 
@@ -264,12 +348,15 @@ def annotate_pdf(
             norm = _normalize_text_for_match(text)
             if len(norm) < 6:
                 return False
-            key = re.sub(r"[^a-z0-9]+", "", norm)
-            if re.fullmatch(r"20x\d", key) or re.fullmatch(r"20\d{2}", key):
+            key = (
+                norm.translate(_ASCII_NON_ALNUM_TABLE) if norm.isascii()
+                else _NON_ALNUM_RE.sub("", norm)
+            )
+            if _YEAR_KEY_RE.fullmatch(key):
                 return False
-            if re.search(r"\d+\s*/\s*\d+", text):
+            if _FRACTION_RE.search(text):
                 return True
-            if re.search(r"\d", text) and len(norm) >= 4:
+            if _DIGIT_RE.search(text) and len(norm) >= 4:
                 return True
             return len(_tokenize(text)) >= 2
 
@@ -306,7 +393,7 @@ def annotate_pdf(
                     else:
                         evidence = (item.get('evidence', '') or '').strip()
                         ev_texts = [
-                            p.strip() for p in re.split(r"\s*;\s*", evidence)
+                            p.strip() for p in _EVIDENCE_SPLIT_RE.split(evidence)
                             if p and p.strip()
                         ]
                     if ev_texts:
@@ -416,11 +503,12 @@ def annotate_pdf(
                         # this narrows it to the specific key_phrase within that line
                         # so the tick + underline land on the right words.
                         if key_phrase and len(key_phrase) >= 3:
-                            _refine_page = doc[found_page_num - 1]
+                            _refine_page = _load_page(doc, found_page_num)
+                            _refine_w, _refine_h = _page_size(_refine_page)
                             _clip = fitz.Rect(
                                 0, max(tick_rect.y0 - 3, 0),
-                                _refine_page.rect.width,
-                                min(tick_rect.y1 + 3, _refine_page.rect.height),
+                                _refine_w,
+                                min(tick_rect.y1 + 3, _refine_h),
                             )
                             kp_words = key_phrase.split()
                             for _end in range(len(kp_words), max(1, len(kp_words) - 2) - 1, -1):
@@ -455,7 +543,7 @@ def annotate_pdf(
                                 pt_text.lower().strip(), set()
                             ).add(line_mark)
 
-                        ev_page = doc[found_page_num - 1]
+                        ev_page = _load_page(doc, found_page_num)
                         found_evidence.append((ev_page, tick_rect, pt_marks))
                         logger.info(f"    ✓ Found: '{key_phrase or pt_text[:60]}'")
                     else:
@@ -558,7 +646,7 @@ def annotate_pdf(
                                     break
 
                         if nr_rect and nr_page_num > 0:
-                            nr_page = doc[nr_page_num - 1]
+                            nr_page = _load_page(doc, nr_page_num)
                             place_not_required_marker(nr_page, nr_rect, nr_reason)
                             nr_local_marks.add(_line_key(nr_page_num, nr_rect.y0))
                             logger.info(f"    ⚑ Not required: '{nr_kp or nr_text[:60]}'")
@@ -606,7 +694,7 @@ def annotate_pdf(
                     s = (label or "").strip()
                     if len(s) < 3:
                         return False
-                    return bool(re.search(r"\d", s))
+                    return bool(_DIGIT_RE.search(s))
 
                 if not score_placed and _label_is_specific(student_label):
                     score_placed = place_score_near_anchor(
@@ -665,7 +753,7 @@ def annotate_pdf(
                 else:
                     evidence = (item.get('evidence', '') or '').strip()
                     evidence_candidates = [
-                        p.strip() for p in re.split(r"\s*;\s*", evidence)
+                        p.strip() for p in _EVIDENCE_SPLIT_RE.split(evidence)
                         if p and p.strip()
                     ]
                 criterion_name = item.get('criterion', '').strip()
@@ -688,7 +776,7 @@ def annotate_pdf(
 
                 _item_reason = str(item.get('reason', '') or '')
                 is_of = item.get('is_of_mark', False) or bool(
-                    re.match(r'^OF[\s\-–]', _item_reason, re.IGNORECASE)
+                    _OF_MARK_RE.match(_item_reason)
                 )
                 if marks == 0 and "Marks given above" in _item_reason:
                     score_label = "Marks given above"
@@ -740,7 +828,7 @@ def annotate_pdf(
                     continue
                 if not entry_rect or entry_page_num <= 0:
                     continue
-                entry_page = doc[entry_page_num - 1]
+                entry_page = _load_page(doc, entry_page_num)
                 _place_score_label(
                     entry_page, entry_rect, entry_page_idx,
                     placed_lines_per_page, _fmt_mark_value(total),
@@ -817,7 +905,7 @@ def annotate_pdf(
                                 break
 
                     if nr_rect and nr_page_num > 0:
-                        nr_page = doc[nr_page_num - 1]
+                        nr_page = _load_page(doc, nr_page_num)
                         place_not_required_marker(nr_page, nr_rect, nr_reason)
                         nr_local_marks.add(_line_key(nr_page_num, nr_rect.y0))
                         logger.info(f"  ⚑ Not required: '{nr_kp or nr_text[:60]}'")
@@ -842,18 +930,20 @@ def annotate_pdf(
                 logger.warning(
                     f"Fallback: placing {len(high_value)} high-value items in margin"
                 )
-                fallback_page_obj = doc[allowed_pages[0] - 1]
+                fallback_page_obj = _load_page(doc, allowed_pages[0])
+                fallback_shape = _page_shape(fallback_page_obj)
+                fallback_x = _page_size(fallback_page_obj)[0] - 280
                 y_pos = 80
                 for score, evidence in high_value[:5]:
-                    fallback_page_obj.insert_text(
-                        (fallback_page_obj.rect.width - 280, y_pos),
+                    fallback_shape.insert_text(
+                        (fallback_x, y_pos),
                         f"Marks given below: {score}pt",
                         fontsize=8,
                         color=(0.8, 0.4, 0),
                     )
                     y_pos += 14
-                    fallback_page_obj.insert_text(
-                        (fallback_page_obj.rect.width - 280, y_pos),
+                    fallback_shape.insert_text(
+                        (fallback_x, y_pos),
                         f"  ({evidence[:30]})",
                         fontsize=7,
                         color=(0.8, 0.4, 0),
@@ -861,18 +951,29 @@ def annotate_pdf(
                     y_pos += 16
 
         # ── Feedback comments ──────────────────────────────────────────────────
-        all_comments = grades_doc.get('comments', [])
-        logger.info(f"Processing {len(all_comments)} comments for feedback...")
+        # Comments that only differ in case/spacing would stack a second popup
+        # on the same anchor; keep the first of each, in the original order.
+        raw_comments = grades_doc.get('comments', []) or []
+        unique_comments: dict[str, str] = {}
+        for c in raw_comments:
+            if isinstance(c, str) and c.strip():
+                unique_comments.setdefault(_normalize_text_for_match(c), c)
+        all_comments = list(unique_comments.values())
+        logger.info(
+            f"Processing {len(all_comments)} comments for feedback "
+            f"({len(raw_comments) - len(all_comments)} empty/duplicate skipped)..."
+        )
+
+        # Strip each comment's [<sub_question>] tag and split its arrow once;
+        # the parts feed both the bounds below and add_popup_for_comment().
+        split_comments = [_presplit_comment(c.strip()) for c in all_comments]
 
         # Pre-compute sub-question Y bounds for every [<sub_question>] tag found
         # in the comments. The grading prompt prepends a tag like "[4.1]" or
         # "[4.3 Payroll Threats]" so the popup lands inside the correct sub-region.
         sub_ids_in_comments: list[str] = []
         seen_ids: set[str] = set()
-        for c in all_comments:
-            if not isinstance(c, str):
-                continue
-            sid, _ = _strip_subq_prefix(c)
+        for sid, _, _ in split_comments:
             if sid and sid not in seen_ids:
                 seen_ids.add(sid)
                 sub_ids_in_comments.append(sid)
@@ -886,12 +987,17 @@ def annotate_pdf(
 
         comments_placed = 0
         unplaced_comments: list[str] = []
-        for idx, comment in enumerate(all_comments, 1):
-            if not comment or not isinstance(comment, str):
-                logger.debug(f"  Comment {idx}: INVALID (empty or non-string)")
+        for idx, (comment, split_comment) in enumerate(zip(all_comments, split_comments), 1):
+            if not split_comment[2]:
+                unplaced_comments.append(comment.strip())
+                logger.warning(
+                    f"  ✗ Comment {idx} NOT PLACED on PDF "
+                    f"(no 'anchor → feedback' split): {comment[:80]!r}"
+                )
                 continue
 
-            logger.debug(f"  Comment {idx}/{len(all_comments)}: {comment[:70]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"  Comment {idx}/{len(all_comments)}: {comment[:70]}...")
 
             try:
                 if add_popup_for_comment(
@@ -907,6 +1013,7 @@ def annotate_pdf(
                     min_y_per_page=min_y_per_page,
                     max_y_per_page=max_y_per_page,
                     subq_y_bounds=subq_y_bounds,
+                    split_comment=split_comment,
                 ):
                     comments_placed += 1
                     logger.debug("    ✓ Comment placed")
@@ -930,8 +1037,22 @@ def annotate_pdf(
         logger.info(f"✓ Comments: {comments_placed}/{len(all_comments)} placed")
 
         # ── Save ───────────────────────────────────────────────────────────────
-        doc.save(output_pdf, garbage=4, deflate=True, clean=True)
-        doc.close()
+        _commit_page_shapes()
+        # Annotations are purely additive, so append them to the copied file
+        # instead of rewriting every page.  Documents MuPDF had to repair on
+        # open cannot be saved incrementally; those get a light full rewrite
+        # (no garbage=4 dedup or clean pass) via a temp file.
+        if doc.can_save_incrementally():
+            doc.save(work_pdf, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            doc.close()
+            doc = None
+        else:
+            tmp_pdf = work_pdf + ".tmp"
+            doc.save(tmp_pdf, garbage=1, deflate=True, clean=False)
+            doc.close()
+            doc = None
+            os.replace(tmp_pdf, work_pdf)
+        os.replace(work_pdf, output_pdf)
 
         annotation_mapping['unplaced_items'] = unplaced_items[:10]
         with open(mapping_json, 'w') as f:
@@ -947,3 +1068,15 @@ def annotate_pdf(
     except Exception as e:
         logger.error(f"Annotation failed for {student_name}: {e}", exc_info=True)
         return False, ""
+    finally:
+        if doc is not None:
+            doc.close()
+        # Leftover work files mean the run failed; never leave a plausible
+        # but unannotated PDF behind.
+        for leftover in (work_pdf, work_pdf + ".tmp") if work_pdf else ():
+            if os.path.exists(leftover):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+        _release_page_caches()
@@ -15,26 +15,36 @@
 #           (whose answer content continues on the next page)
 
 import re
+from bisect import bisect_left, insort
 from typing import Iterable, Optional
 
 import fitz
 
 from logging_config import logger
 from .annotator_config import CONFIG
-from .annotator_ocr import _page_words, _page_dict, _page_search
+from .annotator_ocr import (
+    _load_page, _page_words, _page_lines, _page_search, _page_spans, _page_size,
+    _page_shape,
+)
 from .annotator_text import (
     _strip_llm_artifacts, _normalize_text_for_match, _tokenize,
     _split_comment_arrow, _build_anchor_variations, _line_key,
-    _build_candidate_fragments,
+    _build_candidate_fragments, _NUM_STRIP_TABLE,
 )
 from .annotator_rect import (
     _draw_underline_for_rect, _iter_page_lines, _box_overlaps_page_text,
+    _add_placed_box, _collides_with_placed,
 )
 from .annotator_match import (
     resolve_anchor_rect, _rank_pages_for_anchor,
     clean_anchor_text, extract_number_from_text, _find_best_line_match,
 )
 
+_SYMBOLS_ONLY_RE = re.compile(r'^[^a-zA-Z0-9]*$')
+_SUBQ_PREFIX_RE = re.compile(r"^\s*\[\s*([^\]]+?)\s*\]\s*")
+_SUBQ_NUMERIC_RE = re.compile(r"\s*(\d+(?:\.\d+)*)")
+_SCORE_FRACTION_RE = re.compile(r'\d+\.\d+/\d+')
+
 
 # ── Utility helpers ────────────────────────────────────────────────────────────
 
@@ -62,23 +72,15 @@ def _detect_fontsize_at_rect(page, rect: fitz.Rect, default: float = 11.0) -> fl
     if not rect:
         return default
     try:
-        data = _page_dict(page)
         best_size = default
         best_overlap = 0.0
-        for block in data.get("blocks", []) or []:
-            for line in block.get("lines", []) or []:
-                for span in line.get("spans", []) or []:
-                    bbox = span.get("bbox")
-                    size = span.get("size") or 0
-                    if not bbox or size <= 0:
-                        continue
-                    sr = fitz.Rect(bbox)
-                    if not sr.intersects(rect):
-                        continue
-                    overlap = (sr & rect).get_area()
-                    if overlap > best_overlap:
-                        best_overlap = overlap
-                        best_size = float(size)
+        for sr, size in _page_spans(page):
+            if not sr.intersects(rect):
+                continue
+            overlap = (sr & rect).get_area()
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best_size = size
         return best_size if best_overlap > 0 else default
     except Exception:
         return default
@@ -106,27 +108,30 @@ def _place_score_label(
     """Place one red score label near the matched rect, avoiding collisions."""
     local_fs = _detect_fontsize_at_rect(page, rect, default=float(CONFIG['criterion_score_fontsize']))
     score_font = max(7.0, min(14.0, local_fs))
+    page_w, page_h = _page_size(page)
+
+    score_y = max(min(rect.y1 - 2, page_h - 10), 10)
 
-    score_y = max(min(rect.y1 - 2, page.rect.height - 10), 10)
-    nearby_boxes: list[fitz.Rect] = placed_lines_per_page.get(page_idx, [])
+    def _collides(box: fitz.Rect) -> bool:
+        return _collides_with_placed(placed_lines_per_page, page_idx, box)
 
     score_x = rect.x1 + 3
-    if score_x > page.rect.width - 70:
-        score_x = min(max(rect.x0, 50), page.rect.width - 70)
+    if score_x > page_w - 70:
+        score_x = min(max(rect.x0, 50), page_w - 70)
 
     def _score_box(x: float, y: float) -> fitz.Rect:
         return fitz.Rect(x, y - (score_font + 1), x + 52, y + 3)
 
     placed_box = _score_box(max(score_x, 50), score_y)
-    if any(placed_box.intersects(b) for b in nearby_boxes):
+    if _collides(placed_box):
         candidates_x = [
             max(rect.x0 - 40, 50),
-            min(rect.x1 + 18, page.rect.width - 70),
+            min(rect.x1 + 18, page_w - 70),
         ]
         found = False
         for cx in candidates_x:
             cb = _score_box(cx, score_y)
-            if not any(cb.intersects(b) for b in nearby_boxes):
+            if not _collides(cb):
                 score_x = cx
                 placed_box = cb
                 found = True
@@ -134,26 +139,26 @@ def _place_score_label(
 
         if not found:
             for _ in range(5):
-                score_y = min(score_y + (score_font + 2), page.rect.height - 10)
+                score_y = min(score_y + (score_font + 2), page_h - 10)
                 cb = _score_box(max(score_x, 50), score_y)
-                if not any(cb.intersects(b) for b in nearby_boxes):
+                if not _collides(cb):
                     placed_box = cb
                     break
 
     if _box_overlaps_page_text(page, placed_box):
         shifted_y = max(score_y - 10, 10)
         shifted_box = _score_box(max(score_x, 50), shifted_y)
-        if not any(shifted_box.intersects(b) for b in nearby_boxes):
+        if not _collides(shifted_box):
             score_y = shifted_y
             placed_box = shifted_box
 
-    page.insert_text(
+    _page_shape(page).insert_text(
         (max(score_x, 50), score_y),
         score_text,
         fontsize=score_font,
         color=CONFIG['criterion_score_color'],
     )
-    placed_lines_per_page.setdefault(page_idx, []).append(placed_box)
+    _add_placed_box(placed_lines_per_page, page_idx, placed_box)
 
 
 # ── Tick mark drawing ──────────────────────────────────────────────────────────
@@ -184,18 +189,12 @@ def _place_ticks(page, rect: fitz.Rect, num_ticks: int) -> None:
     total_width = num_ticks * tick_width + (num_ticks - 1) * tick_gap
     start_x = center_x - total_width / 2
 
+    shape = _page_shape(page)
     for i in range(num_ticks):
         x = start_x + i * (tick_width + tick_gap)
-        page.draw_line(
-            fitz.Point(x, base_y - 1),
-            fitz.Point(x + lx, base_y + dn),
-            color=(1, 0, 0), width=stroke_w,
-        )
-        page.draw_line(
-            fitz.Point(x + lx, base_y + dn),
-            fitz.Point(x + tick_width, base_y - up),
-            color=(1, 0, 0), width=stroke_w,
-        )
+        shape.draw_line(fitz.Point(x, base_y - 1), fitz.Point(x + lx, base_y + dn))
+        shape.draw_line(fitz.Point(x + lx, base_y + dn), fitz.Point(x + tick_width, base_y - up))
+        shape.finish(color=(1, 0, 0), width=stroke_w, closePath=False)
 
 
 # ── "Not required" marker ──────────────────────────────────────────────────────
@@ -211,20 +210,17 @@ def place_not_required_marker(page, rect: fitz.Rect, reason: str = "") -> None:
     red = (1, 0, 0)
 
     # Strikethrough across the off-topic span.
-    page.draw_line(
-        fitz.Point(rect.x0, mid_y),
-        fitz.Point(rect.x1, mid_y),
-        color=red,
-        width=max(0.8, round(line_h / 12, 1)),
-    )
+    shape = _page_shape(page)
+    shape.draw_line(fitz.Point(rect.x0, mid_y), fitz.Point(rect.x1, mid_y))
+    shape.finish(color=red, width=max(0.8, round(line_h / 12, 1)), closePath=False)
 
     # "Not required" label placed in the right margin, vertically aligned with the line.
-    page_w = page.rect.width
+    page_w = _page_size(page)[0]
     label_x = min(rect.x1 + 6, page_w - 80)
     if label_x <= rect.x1:
         label_x = max(page_w - 80, rect.x1 + 4)
     label_y = rect.y1 - 1
-    page.insert_text(
+    shape.insert_text(
         (label_x, label_y),
         "Not required",
         fontsize=max(7.0, min(9.0, line_h * 0.7)),
@@ -299,7 +295,7 @@ def place_score_near_anchor(
             break
 
     if rect and page_num != -1:
-        page = doc[page_num - 1]
+        page = _load_page(doc, page_num)
         page_idx = page_num - 1
 
         # FIX-1: only underline evidence lines, never question heading labels
@@ -418,12 +414,13 @@ def add_main_score(
                     return False
 
         # FIX-4: heading near the bottom of the page → content is on the next page
-        if rect.y1 > page.rect.height * 0.80:
+        page_h = _page_size(page)[1]
+        if rect.y1 > page_h * 0.80:
             return True
 
         # Validate substantive content below (within 80 pt on the same page)
         min_y_below = rect.y1 + 5
-        max_y_below = min(rect.y1 + 80, page.rect.height - 20)
+        max_y_below = min(rect.y1 + 80, page_h - 20)
         for word_obj in _page_words(page):
             word_text = word_obj[4].strip()
             word_y = word_obj[1]
@@ -431,14 +428,14 @@ def add_main_score(
                 min_y_below <= word_y <= max_y_below
                 and len(word_text) > 1
                 and not word_text.isspace()
-                and not re.match(r'^[^a-zA-Z0-9]*$', word_text)
+                and not _SYMBOLS_ONLY_RE.match(word_text)
             ):
                 return True
 
         return False
 
     for page_num in allowed_pages:
-        page = doc[page_num - 1]
+        page = _load_page(doc, page_num)
 
         for search_text, strategy_name in strategies:
             instances = _page_search(page, search_text)
@@ -456,7 +453,7 @@ def add_main_score(
                 x = heading_rect.x0 - CONFIG['main_score_offset_x']
                 y = heading_rect.y0 + CONFIG['main_score_offset_y'] - 10
 
-                page.insert_text(
+                _page_shape(page).insert_text(
                     (x, y),
                     score_text,
                     fontsize=CONFIG['main_score_fontsize'],
@@ -470,8 +467,8 @@ def add_main_score(
 
     # Fallback: top-left of the first allowed page
     if allowed_pages:
-        fallback_page = doc[allowed_pages[0] - 1]
-        fallback_page.insert_text(
+        fallback_page = _load_page(doc, allowed_pages[0])
+        _page_shape(fallback_page).insert_text(
             (30, 30),
             score_text,
             fontsize=CONFIG['main_score_fontsize'],
@@ -499,7 +496,7 @@ def _strip_subq_prefix(comment: str) -> tuple[Optional[str], str]:
     """
     if not comment or not isinstance(comment, str):
         return None, comment or ""
-    m = re.match(r"^\s*\[\s*([^\]]+?)\s*\]\s*", comment)
+    m = _SUBQ_PREFIX_RE.match(comment)
     if not m:
         return None, comment
     sub_id = m.group(1).strip()
@@ -507,6 +504,16 @@ def _strip_subq_prefix(comment: str) -> tuple[Optional[str], str]:
     return sub_id, remainder
 
 
+def _presplit_comment(comment: str) -> tuple[Optional[str], str, Optional[tuple[str, str]]]:
+    """Return (sub_id, comment_without_prefix, (anchor, feedback) or None).
+
+    Lets the caller strip the tag and split the arrow once per comment and
+    hand the parts to add_popup_for_comment(split_comment=...).
+    """
+    sub_id, body = _strip_subq_prefix(comment)
+    return sub_id, body, _split_comment_arrow(body)
+
+
 def compute_subq_y_bounds(
     doc,
     allowed_pages: list[int],
@@ -527,7 +534,7 @@ def compute_subq_y_bounds(
 
     # Map each sub_id to its numeric prefix (e.g. '4.1 Threats' -> '4.1').
     def _numeric(sid: str) -> Optional[str]:
-        m = re.match(r"\s*(\d+(?:\.\d+)*)", sid)
+        m = _SUBQ_NUMERIC_RE.match(sid)
         return m.group(1) if m else None
 
     sid_numeric: dict[str, str] = {}
@@ -548,7 +555,7 @@ def compute_subq_y_bounds(
 
     for page_num in allowed_pages:
         try:
-            page = doc[page_num - 1]
+            page = _load_page(doc, page_num)
         except Exception:
             continue
 
@@ -578,7 +585,7 @@ def compute_subq_y_bounds(
             if numeric not in numeric_positions:
                 continue
             min_y = numeric_positions[numeric] - 5
-            max_y = page.rect.height - 20
+            max_y = _page_size(page)[1] - 20
             idx = position_index[numeric]
             for next_n in sorted_present[idx + 1:]:
                 if next_n in numeric_positions:
@@ -589,6 +596,12 @@ def compute_subq_y_bounds(
     return result
 
 
+def _y_is_clear(used_ys: list[float], y: float, gap: float) -> bool:
+    """Return True if no y in the sorted *used_ys* lies within *gap* of *y*."""
+    i = bisect_left(used_ys, y - gap)
+    return i == len(used_ys) or used_ys[i] > y + gap
+
+
 def add_popup_for_comment(
     doc,
     comment: str,
@@ -596,12 +609,13 @@ def add_popup_for_comment(
     placed_marks: Optional[set] = None,
     page_token_sets: Optional[dict[int, set[str]]] = None,
     comment_page_y: Optional[dict[int, float]] = None,
-    comment_used_y: Optional[dict[int, list[float]]] = None,
+    comment_used_y: Optional[dict[int, list[float]]] = None,  # sorted per page
     ocr_textpages: Optional[dict[int, object]] = None,
     placed_lines_per_page: Optional[dict] = None,
     min_y_per_page: Optional[dict[int, float]] = None,
     max_y_per_page: Optional[dict[int, float]] = None,
     subq_y_bounds: Optional[dict[str, dict[int, tuple[float, float]]]] = None,
+    split_comment: Optional[tuple[Optional[str], str, Optional[tuple[str, str]]]] = None,
 ) -> bool:
     """Place a PDF comment annotation anchored to the feedback text.
 
@@ -618,17 +632,19 @@ def add_popup_for_comment(
     # narrows comment placement to its sub-question region; if no prefix is
     # present (older outputs or non-conforming LLM responses), fall back to the
     # whole-question Y range.
-    sub_id, comment = _strip_subq_prefix(comment)
+    if split_comment is not None:
+        sub_id, comment, parsed = split_comment
+    else:
+        sub_id, comment, parsed = _presplit_comment(comment)
     sub_bounds_for_comment: dict[int, tuple[float, float]] = {}
     if sub_id and subq_y_bounds:
         sub_bounds_for_comment = subq_y_bounds.get(sub_id, {}) or {}
 
-    parsed = _split_comment_arrow(comment)
     if not parsed:
         logger.debug(f"  No usable arrow split in comment: '{str(comment)[:40]}...'")
         return False
 
-    if 'TOTAL SCORE' in comment.upper() or re.search(r'\d+\.\d+/\d+', comment):
+    if 'TOTAL SCORE' in comment.upper() or _SCORE_FRACTION_RE.search(comment):
         logger.debug("  Skipping total score comment")
         return False
 
@@ -656,8 +672,9 @@ def add_popup_for_comment(
         page_num: int,
         target_rect: Optional[fitz.Rect] = None,
     ) -> bool:
+        page_w, page_h = _page_size(page)
         q_min_y = float((min_y_per_page or {}).get(page_num, 0))
-        q_max_y = float((max_y_per_page or {}).get(page_num, page.rect.height - 20))
+        q_max_y = float((max_y_per_page or {}).get(page_num, page_h - 20))
 
         # Tighten to the sub-question's region when we have it for this page.
         if page_num in sub_bounds_for_comment:
@@ -673,26 +690,26 @@ def add_popup_for_comment(
                     f"({target_rect.y0:.0f} < {q_min_y:.0f}), dropped"
                 )
                 return False
-            if q_max_y < page.rect.height - 20 and target_rect.y0 > q_max_y:
+            if q_max_y < page_h - 20 and target_rect.y0 > q_max_y:
                 logger.debug(
                     f"  [comment] ✗ target_rect below max_y "
                     f"({target_rect.y0:.0f} > {q_max_y:.0f}), dropped"
                 )
                 return False
-            x = min(target_rect.x1 + 6, page.rect.width - 20)
+            x = min(target_rect.x1 + 6, page_w - 20)
             x = max(x, 10)
-            y = max(min(target_rect.y0 - 1, page.rect.height - 20), 20)
+            y = max(min(target_rect.y0 - 1, page_h - 20), 20)
             if y < 90:
                 y = 110
             # FIX-2: clamp anchored comment to question territory so icon does
             # not bleed visually into the first line of the next question.
-            if q_max_y < page.rect.height - 20:
+            if q_max_y < page_h - 20:
                 y = min(y, q_max_y - 15)
         else:
-            effective_start = max(120.0, float(page.rect.height) * 0.25, q_min_y + 10)
+            effective_start = max(120.0, page_h * 0.25, q_min_y + 10)
             y = float(comment_page_y.get(page_num, effective_start))
-            x = max(page.rect.width - 24, 10)
-            y = max(min(y, page.rect.height - 20), 120)
+            x = max(page_w - 24, 10)
+            y = max(min(y, page_h - 20), 120)
             if q_min_y > 0:
                 y = max(y, q_min_y + 5)
             if q_max_y - 5 > q_min_y + 5:
@@ -701,30 +718,30 @@ def add_popup_for_comment(
         # Avoid collisions with score labels
         if placed_lines_per_page:
             page_idx = page_num - 1
-            score_boxes = placed_lines_per_page.get(page_idx, [])
             comment_box = fitz.Rect(x, y - 8, x + 16, y + 8)
-            if any(comment_box.intersects(sb) for sb in score_boxes):
+            if _collides_with_placed(placed_lines_per_page, page_idx, comment_box):
                 for shift_x in [20, -20, 35, -35]:
-                    nx = max(10, min(x + shift_x, page.rect.width - 20))
+                    nx = max(10, min(x + shift_x, page_w - 20))
                     shifted_box = fitz.Rect(nx, y - 8, nx + 16, y + 8)
-                    if not any(shifted_box.intersects(sb) for sb in score_boxes):
+                    if not _collides_with_placed(placed_lines_per_page, page_idx, shifted_box):
                         x = nx
                         break
 
         # Avoid collisions with existing note icons near the same y.
         # Alternate between shifting down and up to stay close to anchor.
+        # The per-page list stays sorted, so each probe is a bisect.
         used = comment_used_y.setdefault(page_num, [])
         original_y = y
         for attempt in range(8):
-            if all(abs(y - uy) > 14 for uy in used):
+            if _y_is_clear(used, y, 14):
                 break
             if attempt % 2 == 0:
-                y = min(original_y + (attempt // 2 + 1) * 16, page.rect.height - 20)
+                y = min(original_y + (attempt // 2 + 1) * 16, page_h - 20)
             else:
                 y = max(original_y - (attempt // 2 + 1) * 16, 20)
 
         # FIX-2: re-clamp after collision shifts to stay within question territory
-        if q_max_y < page.rect.height - 20:
+        if q_max_y < page_h - 20:
             y = min(y, q_max_y - 15)
 
         try:
@@ -733,7 +750,7 @@ def add_popup_for_comment(
             annot.set_opacity(0.85)
             annot.set_info(content=feedback_part, title="Feedback")
             annot.update()
-            used.append(float(y))
+            insort(used, float(y))
             if target_rect is None:
                 comment_page_y[page_num] = float(y) + 22.0
             logger.debug(
@@ -766,7 +783,7 @@ def add_popup_for_comment(
 
     if rect and page_num != -1:
         try:
-            page = doc[page_num - 1]
+            page = _load_page(doc, page_num)
         except Exception:
             page = None
         if page is not None:
@@ -783,30 +800,32 @@ def add_popup_for_comment(
                     continue
                 yield line_text, fitz.Rect(bbox)
 
+    # Anchor-derived values are the same for every candidate page and line.
+    required_number = extract_number_from_text(anchor_part)
+    rn = required_number.translate(_NUM_STRIP_TABLE) if required_number else ""
+    anchor_tokens = set(
+        _tokenize(clean_anchor_text(anchor_part, max_words=CONFIG['max_anchor_words']) or anchor_part)
+    )
+
     def _best_line_rect(page, textpage_obj) -> Optional[fitz.Rect]:
+        if not anchor_tokens:
+            return None
         try:
-            td = (
-                page.get_text("dict", textpage=textpage_obj)
+            page_lines = (
+                list(_iter_lines_from_dict(page.get_text("dict", textpage=textpage_obj)))
                 if textpage_obj is not None
-                else _page_dict(page)
+                else _page_lines(page)
             )
         except Exception:
             return None
 
-        required_number = extract_number_from_text(anchor_part)
-        anchor_tokens = set(
-            _tokenize(clean_anchor_text(anchor_part, max_words=CONFIG['max_anchor_words']) or anchor_part)
-        )
-        if not anchor_tokens:
-            return None
-
         best_r: Optional[fitz.Rect] = None
         best_s = 0.0
         local_page_num = page.number + 1
         q_min = float((min_y_per_page or {}).get(local_page_num, 0))
         q_max = float((max_y_per_page or {}).get(local_page_num, float('inf')))
 
-        for lt, lr in _iter_lines_from_dict(td):
+        for lt, lr in page_lines:
             if q_min > 0 and lr.y0 < q_min:
                 continue
             if q_max < float('inf') and lr.y0 > q_max:
@@ -816,10 +835,8 @@ def add_popup_for_comment(
             if overlap < 2:
                 continue
             score = overlap / max(len(anchor_tokens), 1)
-            if required_number:
-                rn = required_number.replace(",", "").replace(" ", "")
-                if rn and rn in _normalize_text_for_match(lt).replace(",", "").replace(" ", ""):
-                    score += 0.35
+            if rn and rn in _normalize_text_for_match(lt).translate(_NUM_STRIP_TABLE):
+                score += 0.35
             if score > best_s:
                 best_s = score
                 best_r = lr
@@ -831,7 +848,7 @@ def add_popup_for_comment(
 
     for pnum in ranked_pages[:3]:
         try:
-            page = doc[pnum - 1]
+            page = _load_page(doc, pnum)
         except Exception:
             continue
 
@@ -882,7 +899,7 @@ def add_popup_for_comment(
             )
             if rect and page_num != -1:
                 try:
-                    page = doc[page_num - 1]
+                    page = _load_page(doc, page_num)
                 except Exception:
                     page = None
                 if page is not None:
@@ -892,13 +909,13 @@ def add_popup_for_comment(
     # ── Attempt D: margin-stack within question territory (fallback) ────────────
     page_num = ranked_pages[0] if ranked_pages else (allowed_pages[0] if allowed_pages else 1)
     try:
-        page = doc[page_num - 1]
+        page = _load_page(doc, page_num)
     except Exception:
         logger.debug(f"  [comment] ✗ Invalid page for fallback placement: {page_num}")
         return False
 
     q_min = float((min_y_per_page or {}).get(page_num, 0))
-    q_max = float((max_y_per_page or {}).get(page_num, page.rect.height - 20))
+    q_max = float((max_y_per_page or {}).get(page_num, _page_size(page)[1] - 20))
     if q_max <= q_min + 20:
         logger.debug(f"  [comment] ✗ No usable territory on page {page_num}, comment dropped")
         return False
@@ -6,6 +6,8 @@
 # Supporting helpers: page ranking, number matching, fuzzy line matching,
 # text cleaning, and hybrid number+context search.
 
+import functools
+import logging
 import re
 from typing import Iterable, Optional
 
@@ -13,16 +15,34 @@ import fitz
 
 from logging_config import logger
 from .annotator_config import CONFIG
-from .annotator_ocr import _page_search, _page_words, _page_dict
+from .annotator_ocr import (
+    _load_page, _page_search, _page_words, _page_words_lower, _page_dict,
+    _page_word_index, _page_line_tokens, _page_partial_hits, _page_number_hits,
+    _anchor_results, _page_size,
+)
 from .annotator_text import (
-    _normalize_text_for_match, _strip_llm_artifacts,
-    _tokenize, _build_anchor_variations, _line_key,
+    _str_lru_cache, _strip_llm_artifacts,
+    _tokenize, _build_anchor_variations, _line_key, _NUM_STRIP_TABLE,
 )
 from .annotator_rect import (
-    _iter_page_lines, _expand_rect_to_line, _expand_rect_to_row,
+    _expand_rect_to_line, _expand_rect_to_row,
     _line_text_for_rect, _is_heading_like, _redirect_if_header_like,
-    is_on_same_line, _find_next_numeric_line, _refine_to_numberish_word_on_line,
+    _find_next_numeric_line, _refine_to_numberish_word_on_line,
+    _words_near_y,
+)
+
+_DIGIT_RE = re.compile(r"\d")
+_CURRENCY_PERCENT_RE = re.compile(r"£|\$|%")
+_FRACTION_RE = re.compile(r"\d+/\d+")
+_DECIMAL_RE = re.compile(r"\d+\.\d+")
+_NUMBER_TOKEN_RE = re.compile(
+    r"\b\d[\d,]*(?:\.\d+)?(?:\s*[mk])?\b|\b\d+\s*/\s*\d+\b", re.IGNORECASE
 )
+_CURRENCY_WORD_RE = re.compile(r"£|\$|gbp|usd|eur", re.IGNORECASE)
+_MILLIONS_RE = re.compile(r"\d+(?:\.\d+)?m")
+_THOUSANDS_RE = re.compile(r"\d+(?:\.\d+)?k")
+_SPACED_THOUSANDS_RE = re.compile(r"\d\s+\d{3}\b")
+_MAGNITUDE_SUFFIX_RE = re.compile(r"[mk]", re.IGNORECASE)
 
 
 # ── Page ranking ───────────────────────────────────────────────────────────────
@@ -68,21 +88,23 @@ def _build_context_words(text: str, max_words: int = 6) -> list[str]:
 
 # ── Number variations ──────────────────────────────────────────────────────────
 
-def _build_number_variations(num_text: str) -> list[str]:
+@_str_lru_cache()
+def _build_number_variations(num_text: str) -> tuple[str, ...]:
     """Return all common formatting variants of a numeric string.
 
     Handles thousands separators (comma / space), trailing .00, and
-    fractions like 9/12.
+    fractions like 9/12.  Cached, so every page searched for the same
+    number reuses one variant tuple.
     """
-    clean = (num_text or "").replace(",", "").replace(" ", "")
+    clean = (num_text or "").translate(_NUM_STRIP_TABLE)
     if not clean:
-        return []
+        return ()
 
-    if "/" in clean and re.fullmatch(r"\d+/\d+", clean):
+    if "/" in clean and _FRACTION_RE.fullmatch(clean):
         n, d = clean.split("/", 1)
-        return [clean, f"{n} / {d}", f"{n}/{d}"]
+        return tuple(dict.fromkeys((clean, f"{n} / {d}", f"{n}/{d}")))
 
-    if re.fullmatch(r"\d+\.\d+", clean):
+    if _DECIMAL_RE.fullmatch(clean):
         int_part, dec_part = clean.split(".", 1)
     else:
         int_part, dec_part = clean, None
@@ -121,17 +143,24 @@ def _build_number_variations(num_text: str) -> list[str]:
             space = " ".join(chunks)
             variants.extend([f"{comma}.00", f"{space}.00"])
 
-    dedup: list[str] = []
-    seen: set[str] = set()
-    for v in variants:
-        if v and v not in seen:
-            dedup.append(v)
-            seen.add(v)
-    return dedup
+    return tuple(v for v in dict.fromkeys(variants) if v)
 
 
 def _search_number_variations(page, number_str: str) -> list[fitz.Rect]:
-    """Search for all formatting variants of *number_str* and return unique rects."""
+    """Search for all formatting variants of *number_str* and return unique rects.
+
+    Results are memoised per page; callers get a fresh list.
+    """
+    memo = _page_number_hits(page)
+    cached = memo.get(number_str)
+    if cached is not None:
+        return list(cached)
+    dedup = _search_number_variations_uncached(page, number_str)
+    memo[number_str] = dedup
+    return list(dedup)
+
+
+def _search_number_variations_uncached(page, number_str: str) -> list[fitz.Rect]:
     rects: list[fitz.Rect] = []
     for variation in _build_number_variations(number_str):
         try:
@@ -171,15 +200,17 @@ def _find_best_line_match(
 
     required_number_norm = None
     if required_number:
-        required_number_norm = required_number.replace(",", "").replace(" ", "")
+        required_number_norm = required_number.translate(_NUM_STRIP_TABLE)
+
+    try:
+        page_lines = _page_line_tokens(page)
+    except Exception:
+        return None
 
-    for line_text, line_rect in _iter_page_lines(page):
-        lt_norm = _normalize_text_for_match(line_text)
-        line_tokens = _tokenize(line_text)
+    for _, line_rect, _, lt_compact, line_tokens, line_set in page_lines:
         if not line_tokens:
             continue
 
-        line_set = set(line_tokens)
         overlap = len(anchor_set & line_set)
         if overlap < 1:
             continue
@@ -190,10 +221,8 @@ def _find_best_line_match(
 
         score = overlap / max(len(anchor_set), 1)
 
-        if required_number_norm:
-            lt_digits = lt_norm.replace(",", "").replace(" ", "")
-            if required_number_norm in lt_digits:
-                score += 0.35
+        if required_number_norm and required_number_norm in lt_compact:
+            score += 0.35
 
         if score > best_score:
             best_score = score
@@ -207,19 +236,17 @@ def _find_best_line_match(
     if strong_tokens:
         best_rect2: Optional[fitz.Rect] = None
         best_score2 = 0.0
-        for line_text, line_rect in _iter_page_lines(page):
-            lt_norm = _normalize_text_for_match(line_text)
-            line_tokens = _tokenize(line_text)
+        for line_text, line_rect, lt_norm, _, line_tokens, line_set in page_lines:
             if not line_tokens:
                 continue
-            if not any(st in line_tokens for st in strong_tokens):
+            if not any(st in line_set for st in strong_tokens):
                 continue
-            has_value = bool(re.search(r"\d", lt_norm)) or bool(
-                re.search(r"£|\$|%", line_text) and re.search(r"\d", lt_norm)
+            has_value = bool(_DIGIT_RE.search(lt_norm)) or bool(
+                _CURRENCY_PERCENT_RE.search(line_text) and _DIGIT_RE.search(lt_norm)
             )
             if not has_value:
                 continue
-            score2 = 0.30 + (len(anchor_set & set(line_tokens)) / max(len(anchor_set), 1)) * 0.20
+            score2 = 0.30 + (len(anchor_set & line_set) / max(len(anchor_set), 1)) * 0.20
             if score2 > best_score2:
                 best_score2 = score2
                 best_rect2 = line_rect
@@ -231,10 +258,29 @@ def _find_best_line_match(
 
 # ── Anchor text cleaning ───────────────────────────────────────────────────────
 
+_NUMERIC_WORD_RE = re.compile(r'^\d|\d.*\d|FV|NCI|OCI')
+_ANCHOR_SYMBOLS_TABLE = str.maketrans('', '', ',£$%×')
+
+
+@functools.lru_cache(maxsize=8192)
+def _anchor_word_score(word: str) -> int:
+    """Distinctiveness score of a single word (symbols, numbers, proper nouns)."""
+    # One C-level pass deletes every scoring symbol; the length drop is
+    # their total count.
+    score = len(word) - len(word.translate(_ANCHOR_SYMBOLS_TABLE))
+    if _NUMERIC_WORD_RE.match(word):
+        score += 1
+    if word[0].isupper() and len(word) > 2:
+        score += 1
+    return score
+
+
+@_str_lru_cache()
 def clean_anchor_text(text: str, max_words: int = 6) -> Optional[str]:
     """Extract the most distinctive *max_words*-word chunk from *text*.
 
     Prioritises chunks with numbers, currency symbols, and proper nouns.
+    Word scores are computed once and summed over a rolling window.
     """
     if not text or not isinstance(text, str):
         return None
@@ -243,24 +289,27 @@ def clean_anchor_text(text: str, max_words: int = 6) -> Optional[str]:
     if len(words) < 2:
         return None
 
-    best_chunk, best_score = None, 0
+    scores = [_anchor_word_score(w) for w in words]
+    best_start, best_score = -1, 0
+    window = sum(scores[:max_words])
     for i in range(len(words) - max_words + 1):
-        chunk = " ".join(words[i:i + max_words])
-        score = (
-            chunk.count(',') + chunk.count('£') + chunk.count('$')
-            + chunk.count('%') + chunk.count('×')
-            + sum(1 for w in chunk.split() if re.match(r'^\d|\d.*\d|FV|NCI|OCI', w))
-            + len([w for w in chunk.split() if w[0].isupper() and len(w) > 2])
-        )
-        if score > best_score:
-            best_score, best_chunk = score, chunk
-    return best_chunk or " ".join(words[:max_words])
+        if i:
+            window += scores[i + max_words - 1] - scores[i - 1]
+        if window > best_score:
+            best_score, best_start = window, i
+    if best_start < 0:
+        return " ".join(words[:max_words])
+    return " ".join(words[best_start:best_start + max_words])
 
 
 # ── Partial / fuzzy text search ────────────────────────────────────────────────
 
 def find_text_rects_partial(page, search_text: str, full_match: bool = False) -> list[fitz.Rect]:
-    """Find text rects with optional fuzzy (word-level) matching."""
+    """Find text rects with optional fuzzy (word-level) matching.
+
+    Each distinct page word is compared once (via the per-page word index)
+    rather than once per occurrence; hits are returned in page order.
+    """
     if not search_text:
         return []
 
@@ -268,20 +317,52 @@ def find_text_rects_partial(page, search_text: str, full_match: bool = False) ->
         hits = _page_search(page, search_text)
         return hits if hits else []
 
+    hits_by_query = _partial_hit_positions(page, [q.lower() for q in search_text.split()])
+    hit_positions = [i for positions in hits_by_query.values() for i in positions]
+    return _rects_at_positions(page, hit_positions)
+
+
+def find_text_rects_many(page, queries: list[str]) -> dict[str, list[fitz.Rect]]:
+    """Partial-match several single-word *queries* in one sweep of the page.
+
+    Equivalent to calling ``find_text_rects_partial(page, q)`` for each
+    query, but the distinct page tokens are walked only once.
+    """
+    qlow = [(q, q.lower()) for q in queries if q]
+    hits_by_query = _partial_hit_positions(page, [ql for _, ql in qlow])
+    return {q: _rects_at_positions(page, hits_by_query[ql]) for q, ql in qlow}
+
+
+def _partial_hit_positions(page, queries: list[str]) -> dict[str, list[int]]:
+    """Map each lowercased query to the word positions whose token contains,
+    or is contained in, it.
+
+    Results are memoised per page, and all uncached queries share a single
+    sweep over the page's distinct tokens.
+    """
+    memo = _page_partial_hits(page)
+    pending = [q for q in dict.fromkeys(queries) if q not in memo]
+    if pending:
+        found: dict[str, list[int]] = {q: [] for q in pending}
+        for token, positions in _page_word_index(page).items():
+            for q in pending:
+                if q in token or token in q:
+                    found[q].extend(positions)
+        memo.update(found)
+    return {q: memo[q] for q in queries}
+
+
+def _rects_at_positions(page, positions: list[int]) -> list[fitz.Rect]:
+    """Return de-duplicated word rects for *positions*, in page order."""
+    words = _page_words(page)
     matches: list[fitz.Rect] = []
     seen: set[tuple[float, float, float, float]] = set()
-
-    words = search_text.split()
-    for w in _page_words(page):
-        word_lower = w[4].lower()
-        for search_word in words:
-            if search_word.lower() in word_lower or word_lower in search_word.lower():
-                rect = fitz.Rect(w[:4])
-                rect_key = (rect.x0, rect.y0, rect.x1, rect.y1)
-                if rect_key not in seen:
-                    matches.append(rect)
-                    seen.add(rect_key)
-                break
+    for i in sorted(positions):
+        rect = fitz.Rect(words[i][:4])
+        rect_key = (rect.x0, rect.y0, rect.x1, rect.y1)
+        if rect_key not in seen:
+            matches.append(rect)
+            seen.add(rect_key)
     return matches
 
 
@@ -301,27 +382,26 @@ def find_number_with_context(
         logger.debug(f"  [hybrid] Number not found: {number_str}")
         return None
 
-    logger.debug(f"  [hybrid] Found {len(num_rects)} occurrence(s) of {number_str}, scoring context...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"  [hybrid] Found {len(num_rects)} occurrence(s) of {number_str}, scoring context...")
 
-    words_cache = _page_words(page)
+    words_lower = _page_words_lower(page)
+    context_lower = [(ctx, (ctx or "").lower()) for ctx in context_words]
+    tol = CONFIG['y_tolerance']
     best_rect: Optional[fitz.Rect] = None
     best_score = -1.0
     best_matches: list[str] = []
 
     for idx, num_rect in enumerate(num_rects):
-        line_words: list[str] = []
-        for word_obj in words_cache:
-            word_rect = fitz.Rect(word_obj[:4])
-            if abs(word_rect.y0 - num_rect.y0) <= CONFIG['y_tolerance']:
-                wtxt = (word_obj[4] or "").strip().lower()
-                if wtxt:
-                    line_words.append(wtxt)
+        # Same-line words come from the y-sorted word index, not a page scan.
+        line_words = [
+            words_lower[i] for i in _words_near_y(page, 1, num_rect.y0, tol)
+            if words_lower[i]
+        ]
 
         matched_contexts = [
-            ctx for ctx in context_words
-            if (ctx or "").lower() and any(
-                ctx.lower() in w or w in ctx.lower() for w in line_words
-            )
+            ctx for ctx, ctx_l in context_lower
+            if ctx_l and any(ctx_l in w or w in ctx_l for w in line_words)
         ]
 
         frac = len(matched_contexts) / max(len(context_words), 1)
@@ -339,7 +419,8 @@ def find_number_with_context(
             best_matches = matched_contexts
 
     if best_rect is not None and best_score >= (1.0 / max(len(context_words), 1)):
-        logger.debug(f"  [hybrid] ✓ Best match: {len(best_matches)} context word(s): {best_matches}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"  [hybrid] ✓ Best match: {len(best_matches)} context word(s): {best_matches}")
         return best_rect
 
     logger.debug("  [hybrid] Number found but no sufficiently strong context match")
@@ -348,6 +429,7 @@ def find_number_with_context(
 
 # ── Number extraction ──────────────────────────────────────────────────────────
 
+@_str_lru_cache()
 def extract_number_from_text(text: str) -> Optional[str]:
     """Extract the most 'result-like' number from *text* for hybrid anchoring.
 
@@ -356,20 +438,17 @@ def extract_number_from_text(text: str) -> Optional[str]:
     if not text or not isinstance(text, str):
         return None
 
-    token_re = re.compile(
-        r"\b\d[\d,]*(?:\.\d+)?(?:\s*[mk])?\b|\b\d+\s*/\s*\d+\b", re.IGNORECASE
-    )
-    tokens = token_re.findall(text)
+    tokens = _NUMBER_TOKEN_RE.findall(text)
     if not tokens:
         return None
 
-    has_currency = bool(re.search(r"£|\$|gbp|usd|eur", text, flags=re.IGNORECASE))
+    has_currency = bool(_CURRENCY_WORD_RE.search(text))
 
     def _token_value(tok: str) -> Optional[float]:
-        t = (tok or "").strip().lower().replace(",", "").replace(" ", "")
+        t = (tok or "").strip().lower().translate(_NUM_STRIP_TABLE)
         if not t:
             return None
-        if "/" in t and re.fullmatch(r"\d+/\d+", t):
+        if "/" in t and _FRACTION_RE.fullmatch(t):
             try:
                 n, d = t.split("/", 1)
                 den = float(d)
@@ -377,10 +456,10 @@ def extract_number_from_text(text: str) -> Optional[str]:
             except Exception:
                 return None
         mult = 1.0
-        if t.endswith("m") and re.fullmatch(r"\d+(?:\.\d+)?m", t):
+        if t.endswith("m") and _MILLIONS_RE.fullmatch(t):
             mult = 1_000_000.0
             t = t[:-1]
-        elif t.endswith("k") and re.fullmatch(r"\d+(?:\.\d+)?k", t):
+        elif t.endswith("k") and _THOUSANDS_RE.fullmatch(t):
             mult = 1_000.0
             t = t[:-1]
         try:
@@ -389,7 +468,7 @@ def extract_number_from_text(text: str) -> Optional[str]:
             return None
 
     left_text = text.split("=", 1)[0] if "=" in text else text
-    pool = token_re.findall(left_text) or tokens
+    pool = _NUMBER_TOKEN_RE.findall(left_text) or tokens
 
     scored: list[tuple[float, str]] = []
     for raw in pool:
@@ -399,9 +478,9 @@ def extract_number_from_text(text: str) -> Optional[str]:
         if abs(val) < 1 and "/" not in raw:
             continue
         score = abs(val)
-        if "," in raw or re.search(r"\d\s+\d{3}\b", raw):
+        if "," in raw or _SPACED_THOUSANDS_RE.search(raw):
             score *= 1.15
-        if re.search(r"[mk]", raw, flags=re.IGNORECASE):
+        if _MAGNITUDE_SUFFIX_RE.search(raw):
             score *= 1.10
         if has_currency and abs(val) >= 100:
             score *= 1.05
@@ -422,10 +501,30 @@ def find_number_rect_in_text(page, text_rect: fitz.Rect, number_str: str) -> fit
         return text_rect
 
     try:
+        x_limit = _page_size(page)[0] - 50
+        needle = number_str.strip().lower()
+        if needle and " " not in needle:
+            # Single-token numbers: filter the cached words in the rect's
+            # band instead of running a clipped search_for on the page.
+            words = _page_words(page)
+            lowered = _page_words_lower(page)
+            half_h = (text_rect.y1 - text_rect.y0) / 2 + 2
+            mid_y = (text_rect.y0 + text_rect.y1) / 2
+            hits = [
+                i for i in _words_near_y(page, 1, mid_y, half_h)
+                if needle in lowered[i] and text_rect.x0 <= words[i][0] < x_limit
+            ]
+            if hits:
+                w = words[max(hits, key=lambda i: words[i][0])]
+                found_rect = fitz.Rect(w[:4])
+                logger.debug(f"      [refined] Number: x={found_rect.x0:.1f} (text was x={text_rect.x0:.1f})")
+                return found_rect
+            return text_rect
+
         search_area = fitz.Rect(
             text_rect.x0,
             text_rect.y0 - 2,
-            page.rect.width - 50,
+            x_limit,
             text_rect.y1 + 2,
         )
         num_hits = _page_search(page, number_str, clip=search_area)
@@ -462,10 +561,54 @@ def resolve_anchor_rect(
       3. Cleaned/shortened phrase match
       4. Token-level fuzzy line match
       5. Word-cluster match (last resort)
+
+    With skip_duplicates=False the result depends only on the arguments and
+    the (first-read) page caches, so it is memoised for the rest of the run.
     """
     if not anchor_text or not isinstance(anchor_text, str):
         return None, -1
 
+    if skip_duplicates:
+        return _resolve_anchor_rect(
+            doc, anchor_text, allowed_pages, placed_marks, skip_duplicates,
+            expand_to_line, page_token_sets, use_number_first, redirect_headings,
+            min_y_per_page, max_y_per_page,
+        )
+
+    memo = _anchor_results()
+    key = (
+        anchor_text, tuple(allowed_pages), expand_to_line,
+        id(page_token_sets) if page_token_sets else None,
+        use_number_first, redirect_headings,
+        tuple(sorted((min_y_per_page or {}).items())),
+        tuple(sorted((max_y_per_page or {}).items())),
+    )
+    if key not in memo:
+        memo[key] = _resolve_anchor_rect(
+            doc, anchor_text, allowed_pages, placed_marks, skip_duplicates,
+            expand_to_line, page_token_sets, use_number_first, redirect_headings,
+            min_y_per_page, max_y_per_page,
+        )
+    rect, page_num = memo[key]
+    # Callers may adjust the rect they get back; keep the memoised one intact.
+    return (fitz.Rect(rect) if rect is not None else None), page_num
+
+
+def _resolve_anchor_rect(
+    doc,
+    anchor_text: str,
+    allowed_pages: list[int],
+    placed_marks: Optional[set],
+    skip_duplicates: bool,
+    expand_to_line: bool,
+    page_token_sets: Optional[dict[int, set[str]]],
+    use_number_first: bool,
+    redirect_headings: bool,
+    min_y_per_page: Optional[dict[int, float]],
+    max_y_per_page: Optional[dict[int, float]],
+) -> tuple[Optional[fitz.Rect], int]:
+    """Uncached strategy ladder behind resolve_anchor_rect()."""
+
     if placed_marks is None:
         placed_marks = set()
 
@@ -493,12 +636,13 @@ def resolve_anchor_rect(
     num = extract_number_from_text(anchor_text) if use_number_first else None
     if num:
         logger.debug(f"    → Number-first approach: searching for '{num}' (extracted from evidence)")
+        context_words = _build_context_words(anchor_text, max_words=6)
 
         for page_num in ranked_pages:
-            page = doc[page_num - 1]
-            context_words = _build_context_words(anchor_text, max_words=6)
+            page = _load_page(doc, page_num)
 
-            logger.debug(f"    [number-first] Trying hybrid: num={num}, context={context_words[:3]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"    [number-first] Trying hybrid: num={num}, context={context_words[:3]}")
             hybrid_rect = find_number_with_context(page, num, context_words)
             if hybrid_rect and not _outside_boundary(page_num, hybrid_rect):
                 mark_key = _line_key(page_num, hybrid_rect.y0)
@@ -523,9 +667,18 @@ def resolve_anchor_rect(
                         return redirected, page_num
                     return chosen, page_num
 
-    # Strategy 1: exact phrase match
+    anchor_words = anchor_text.split()[:CONFIG['max_anchor_words']]
+    cluster_words = [w for w in anchor_words if len(w) > 2]
+    cluster_needed = max(2, len(anchor_words) - 2)
+
+    clean_phrase = clean_anchor_text(anchor_text)
+
+    # Pass 1 — the cheap search_for strategies (1–2) across every allowed
+    # page, so an exact hit on a later page is found before any fuzzy
+    # matching runs on the earlier ones.
     for page_num in ranked_pages:
-        page = doc[page_num - 1]
+        page = _load_page(doc, page_num)
+        # Strategy 1: exact phrase match
         exact_hits = _page_search(page, anchor_text)
         if exact_hits:
             for rect in exact_hits:
@@ -533,7 +686,8 @@ def resolve_anchor_rect(
                     continue
                 mark_key = _line_key(page_num, rect.y0)
                 if skip_duplicates and mark_key in placed_marks:
-                    logger.debug(f"    [exact-skip] Rect at y={rect.y0:.1f} already marked, trying next...")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"    [exact-skip] Rect at y={rect.y0:.1f} already marked, trying next...")
                     continue
                 if num:
                     refined_rect = find_number_rect_in_text(page, rect, num)
@@ -547,7 +701,6 @@ def resolve_anchor_rect(
                 return chosen, page_num
 
         # Strategy 2: cleaned phrase
-        clean_phrase = clean_anchor_text(anchor_text)
         if clean_phrase and clean_phrase != anchor_text:
             clean_hits = _page_search(page, clean_phrase)
             if clean_hits:
@@ -556,7 +709,8 @@ def resolve_anchor_rect(
                         continue
                     mark_key = _line_key(page_num, rect.y0)
                     if skip_duplicates and mark_key in placed_marks:
-                        logger.debug(f"    [clean-skip] Rect at y={rect.y0:.1f} already marked, trying next...")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f"    [clean-skip] Rect at y={rect.y0:.1f} already marked, trying next...")
                         continue
                     if num:
                         refined_rect = find_number_rect_in_text(page, rect, num)
@@ -569,12 +723,18 @@ def resolve_anchor_rect(
                         return redirected, page_num
                     return chosen, page_num
 
+    # Pass 2 — fuzzy line and word-cluster strategies (3–4), only reached
+    # when no page has a phrase hit.
+    for page_num in ranked_pages:
+        page = _load_page(doc, page_num)
+
         # Strategy 3: token-level fuzzy line match
         best_line = _find_best_line_match(page, anchor_text, required_number=num)
         if best_line and not _outside_boundary(page_num, best_line):
             mark_key = _line_key(page_num, best_line.y0)
             if skip_duplicates and mark_key in placed_marks:
-                logger.debug(f"    [line-fuzzy-skip] Rect at y={best_line.y0:.1f} already marked, trying next...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"    [line-fuzzy-skip] Rect at y={best_line.y0:.1f} already marked, trying next...")
             else:
                 logger.debug(f"    [line-fuzzy] '{evidence_preview}' → BEST LINE TOKEN MATCH on page {page_num}")
                 chosen = _expand_rect_to_line(page, best_line) if expand_to_line else best_line
@@ -583,27 +743,30 @@ def resolve_anchor_rect(
                     return redirected, page_num
                 return chosen, page_num
 
-        # Strategy 4: word-by-word clustering (last resort)
-        words = anchor_text.split()[:CONFIG['max_anchor_words']]
+        # Strategy 4: word-by-word clustering (last resort).
+        # All cluster words are matched in one sweep of the page tokens;
+        # pages with too few candidate words are skipped outright.
         rects_by_word: list[list[fitz.Rect]] = []
-        for word in words:
-            if len(word) > 2:
-                hits = find_text_rects_partial(page, word, full_match=False)
-                if hits:
-                    rects_by_word.append(hits)
+        if len(cluster_words) >= cluster_needed:
+            hits_by_word = find_text_rects_many(page, cluster_words)
+            rects_by_word = [hits_by_word[w] for w in cluster_words if hits_by_word.get(w)]
 
-        if rects_by_word and len(rects_by_word) >= max(2, len(words) - 2):
+        if rects_by_word and len(rects_by_word) >= cluster_needed:
             first_matches = [rects[0] for rects in rects_by_word if rects]
             if first_matches:
-                first_matches.sort(key=lambda r: r.x0)
                 y_vals = [r.y0 for r in first_matches]
-                if max(y_vals) - min(y_vals) <= CONFIG['y_tolerance']:
-                    combined = first_matches[0]
-                    for r in first_matches[1:]:
-                        combined = combined | r
+                top = min(y_vals)
+                if max(y_vals) - top <= CONFIG['y_tolerance']:
+                    # Bounding box in one pass; no sort or intermediate rects.
+                    combined = fitz.Rect(
+                        min(r.x0 for r in first_matches), top,
+                        max(r.x1 for r in first_matches),
+                        max(r.y1 for r in first_matches),
+                    )
                     mark_key = _line_key(page_num, combined.y0)
                     if skip_duplicates and mark_key in placed_marks:
-                        logger.debug(f"    [cluster-skip] Rect at y={combined.y0:.1f} already marked, trying next...")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f"    [cluster-skip] Rect at y={combined.y0:.1f} already marked, trying next...")
                     else:
                         logger.debug(f"    [cluster] '{evidence_preview}' → WORD CLUSTER on page {page_num}")
                         chosen = _expand_rect_to_line(page, combined) if expand_to_line else combined
@@ -613,7 +776,8 @@ def resolve_anchor_rect(
                         return chosen, page_num
 
             if not best_rect:
-                best_rect, best_page = first_matches[0], page_num
+                # Leftmost cluster word, as the old x0 sort put first.
+                best_rect, best_page = min(first_matches, key=lambda r: r.x0), page_num
                 logger.debug(f"    [fallback] Keeping word cluster as fallback on page {page_num}")
 
     if best_rect and best_page != -1 and not _outside_boundary(best_page, best_rect):
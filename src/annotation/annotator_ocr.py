@@ -1,16 +1,151 @@
 # ==================== OCR-AWARE PAGE HELPERS ====================
 #
-# _ocr_pages: page indices (0-based) that have significant images and need OCR.
-# _ocr_tp_cache: page.number → (page_obj, textpage).  Storing the page object
+# All per-document state lives in a _PageCaches instance created by
+# _init_ocr_cache() and bound to the calling thread, so concurrent
+# annotate_pdf() runs (one per Streamlit session thread) never see each
+# other's pages.  Its fields:
+#
+# ocr_pages: page indices (0-based) that have significant images and need OCR.
+# ocr_tp: page.number → (page_obj, textpage).  Storing the page object
 #   prevents GC from destroying it, which keeps the textpage's weak-ref alive.
+# words / search: per-page results of get_text("words") and unclipped
+#   search_for(), so repeated anchor lookups do not re-parse the page
+#   content stream.  Both reflect the page as first read (before any score
+#   labels are inserted).
+# dicts / texts / lines / spans: per-page get_text("dict"), get_text("text")
+#   and the (line_text, line_rect) and (span_rect, font_size) lists derived
+#   from the dict; same lifetime and first-read semantics as words.
+# words_lower: page.number → stripped, lowercased text of each word (parallel
+#   to words), so matchers do not re-lowercase per comparison.
+# word_index: page.number → lowercased token → positions in words.
+# partial_hits: page.number → {lowercased query: word positions} memo for
+#   annotator_match's substring word matching.
+# number_hits: page.number → {number string: rects of all its formatting
+#   variants}, memoising annotator_match's number search.
+# word_y_index: page.number → {edge: (sorted coords, positions)} for the
+#   y0 (edge 1) and y1 (edge 3) of every word, for same-row range queries.
+# line_tokens: page.number → per-line normalised text and _tokenize() output,
+#   so fuzzy line matching does not re-normalise every line per anchor.
+# textpages: page.number → (page_obj, textpage) built with search_for's
+#   default flags, so plain searches on non-OCR pages share one extraction.
+# compact_texts: page.number → lowercase alphanumeric-only text of that
+#   TextPage; needles whose alphanumeric runs are absent skip search_for.
+# anchor_results: resolve_anchor_rect() results for skip_duplicates=False
+#   calls, keyed by their arguments.
+# sizes: page.number → (width, height) of page.rect, read once.
+# shapes: page.number → fitz.Shape collecting this run's lines and labels
+#   for that page; _commit_page_shapes() writes each into its page once.
+# pages: one page object per page number for the whole run (see _load_page),
+#   so every helper sees the same identity-stable page.
+#
 # All helpers accept the caller's page object and route through the cached
 # (identity-matched) page when an OCR textpage is present.
 
+import re
+import threading
+from array import array
+from dataclasses import dataclass, field
+
 import fitz
 from logging_config import logger
 
-_ocr_pages: set[int] = set()
-_ocr_tp_cache: dict[int, tuple] = {}  # page.number → (page_obj, textpage)
+from .annotator_text import _normalize_text_for_match, _tokenize, _NUM_STRIP_TABLE
+
+
+@dataclass(slots=True)
+class _PageCaches:
+    ocr_pages: set[int] = field(default_factory=set)
+    ocr_tp: dict[int, tuple] = field(default_factory=dict)
+    words: dict[int, list] = field(default_factory=dict)
+    search: dict[tuple[int, str], list] = field(default_factory=dict)
+    words_lower: dict[int, list[str]] = field(default_factory=dict)
+    word_index: dict[int, dict[str, list[int]]] = field(default_factory=dict)
+    word_y_index: dict[int, dict] = field(default_factory=dict)
+    partial_hits: dict[int, dict[str, list[int]]] = field(default_factory=dict)
+    number_hits: dict[int, dict[str, list]] = field(default_factory=dict)
+    dicts: dict[int, dict] = field(default_factory=dict)
+    texts: dict[int, str] = field(default_factory=dict)
+    lines: dict[int, list] = field(default_factory=dict)
+    spans: dict[int, list] = field(default_factory=dict)
+    line_tokens: dict[int, list] = field(default_factory=dict)
+    textpages: dict[int, tuple] = field(default_factory=dict)
+    compact_texts: dict[int, str] = field(default_factory=dict)
+    sizes: dict[int, tuple[float, float]] = field(default_factory=dict)
+    anchor_results: dict[tuple, tuple] = field(default_factory=dict)
+    shapes: dict[int, object] = field(default_factory=dict)
+    pages: dict[int, object] = field(default_factory=dict)  # 1-based page number → page
+
+
+_local = threading.local()
+
+
+def _caches() -> _PageCaches:
+    """Return the calling thread's caches, creating empty ones if needed."""
+    caches = getattr(_local, "caches", None)
+    if caches is None:
+        caches = _local.caches = _PageCaches()
+    return caches
+
+
+# search_for() builds its TextPage with these flags; a shared TextPage must
+# match them or hit positions could differ from an uncached search.
+_SEARCH_TP_FLAGS = (
+    fitz.TEXT_DEHYPHENATE
+    | fitz.TEXT_PRESERVE_WHITESPACE
+    | fitz.TEXT_PRESERVE_LIGATURES
+    | fitz.TEXT_MEDIABOX_CLIP
+)
+_ASCII_ALNUM_RUN_RE = re.compile(r"[a-z0-9]+")
+
+# get_text("dict") flags without TEXT_PRESERVE_IMAGES: only text lines and
+# spans are read from the dict, so image blocks (with their decoded bytes)
+# are never extracted.
+_DICT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _load_page(doc, page_num: int):
+    """Return the page object for 1-based *page_num*, loading it only once.
+
+    doc[i] builds a new Page wrapper on every call; the annotation passes
+    revisit the same few pages hundreds of times.
+    """
+    pages = _caches().pages
+    page = pages.get(page_num)
+    if page is None:
+        page = doc[page_num - 1]
+        pages[page_num] = page
+    return page
+
+
+def _page_size(page) -> tuple[float, float]:
+    """Return (width, height) of *page*; page.rect builds a new Rect per access."""
+    sizes = _caches().sizes
+    size = sizes.get(page.number)
+    if size is None:
+        r = page.rect
+        size = sizes[page.number] = (r.width, r.height)
+    return size
+
+
+def _page_shape(page):
+    """Return the run's shared Shape for *page*, creating it on first use.
+
+    Drawing through one Shape per page splices a single content stream into
+    the page at commit time instead of one per line or label.
+    """
+    shapes = _caches().shapes
+    shape = shapes.get(page.number)
+    if shape is None:
+        shape = shapes[page.number] = page.new_shape()
+    return shape
+
+
+def _commit_page_shapes() -> None:
+    """Write every pending page Shape into its page (call before saving)."""
+    shapes = _caches().shapes
+    for shape in shapes.values():
+        shape.commit(overlay=True)
+    shapes.clear()
 
 
 def _get_ocr_page_and_tp(page):
@@ -19,52 +154,255 @@ def _get_ocr_page_and_tp(page):
     When OCR is active for this page the *cached* page object is returned
     (its identity matches tp.parent).  Otherwise returns (page, None).
     """
-    if page.number not in _ocr_pages:
+    caches = _caches()
+    if page.number not in caches.ocr_pages:
         return page, None
-    cached = _ocr_tp_cache.get(page.number)
+    cached = caches.ocr_tp.get(page.number)
     if cached is not None:
         return cached
     try:
         tp = page.get_textpage_ocr(dpi=200, full=True)
-        _ocr_tp_cache[page.number] = (page, tp)
+        caches.ocr_tp[page.number] = (page, tp)
         logger.info(f"  OCR textpage created for page {page.number + 1}")
         return page, tp
     except Exception as e:
         logger.debug(f"  OCR failed for page {page.number + 1}: {e}")
-        _ocr_pages.discard(page.number)
+        caches.ocr_pages.discard(page.number)
         return page, None
 
 
 def _page_search(page, text, **kwargs):
-    """OCR-aware replacement for page.search_for()."""
+    """OCR-aware replacement for page.search_for().
+
+    Plain (keyword-free) searches are memoised per page; callers get a fresh
+    list so they can filter or sort it freely.
+    """
+    search_cache = _caches().search
+    key = (page.number, text) if not kwargs else None
+    if key is not None:
+        cached = search_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
     ocr_page, tp = _get_ocr_page_and_tp(page)
     if tp is not None:
-        return ocr_page.search_for(text, textpage=tp, **kwargs)
-    return page.search_for(text, **kwargs)
+        hits = ocr_page.search_for(text, textpage=tp, **kwargs)
+    elif key is not None:
+        hits = _search_with_shared_textpage(page, text)
+    else:
+        hits = page.search_for(text, **kwargs)
+
+    if key is not None:
+        search_cache[key] = hits
+        return list(hits)
+    return hits
+
+
+def _search_with_shared_textpage(page, text):
+    """Unclipped search_for() on a TextPage extracted once per page.
+
+    Falls back to a plain search when the TextPage cannot be built or does
+    not belong to *page*.
+    """
+    textpages = _caches().textpages
+    cached = textpages.get(page.number)
+    if cached is None:
+        try:
+            cached = (page, page.get_textpage(flags=_SEARCH_TP_FLAGS))
+        except Exception as e:
+            logger.debug(f"  TextPage build failed for page {page.number + 1}: {e}")
+            return page.search_for(text)
+        textpages[page.number] = cached
+    tp_page, tp = cached
+    if tp_page is not page:
+        return page.search_for(text)
+    if not _may_contain(page.number, tp, text):
+        return []
+    return page.search_for(text, textpage=tp)
+
+
+def _may_contain(page_number: int, tp, text: str) -> bool:
+    """Cheap pre-check: can search_for(*text*) on this TextPage find anything?
+
+    Compares alphanumeric runs only, so whitespace, hyphenation and case
+    differences never cause a false negative.  Non-ASCII needles are always
+    passed through to search_for.
+    """
+    if not isinstance(text, str) or not text.isascii():
+        return True
+    compact_texts = _caches().compact_texts
+    compact = compact_texts.get(page_number)
+    if compact is None:
+        try:
+            compact = "".join(ch for ch in tp.extractText().lower() if ch.isalnum())
+        except Exception:
+            return True
+        compact_texts[page_number] = compact
+    return all(run in compact for run in _ASCII_ALNUM_RUN_RE.findall(text.lower()))
 
 
 def _page_words(page):
-    """OCR-aware replacement for page.get_text('words')."""
+    """OCR-aware replacement for page.get_text('words'), cached per page."""
+    words_cache = _caches().words
+    cached = words_cache.get(page.number)
+    if cached is not None:
+        return cached
     ocr_page, tp = _get_ocr_page_and_tp(page)
     if tp is not None:
-        return ocr_page.get_text("words", textpage=tp)
-    return page.get_text("words")
+        words = ocr_page.get_text("words", textpage=tp)
+    else:
+        words = page.get_text("words")
+    words_cache[page.number] = words
+    return words
+
+
+def _page_words_lower(page) -> list[str]:
+    """Stripped, lowercased text of each entry in _page_words(), cached per page."""
+    lower_cache = _caches().words_lower
+    cached = lower_cache.get(page.number)
+    if cached is not None:
+        return cached
+    lowered = [(w[4] or "").strip().lower() for w in _page_words(page)]
+    lower_cache[page.number] = lowered
+    return lowered
+
+
+def _page_word_index(page) -> dict[str, list[int]]:
+    """Map each distinct lowercased word on the page to its positions in _page_words()."""
+    index_cache = _caches().word_index
+    cached = index_cache.get(page.number)
+    if cached is not None:
+        return cached
+    index: dict[str, list[int]] = {}
+    for i, w in enumerate(_page_words(page)):
+        index.setdefault(w[4].lower(), []).append(i)
+    index_cache[page.number] = index
+    return index
+
+
+def _page_partial_hits(page) -> dict[str, list[int]]:
+    """Return this page's (mutable) query → word positions memo."""
+    return _caches().partial_hits.setdefault(page.number, {})
+
+
+def _page_number_hits(page) -> dict[str, list]:
+    """Return this page's (mutable) number string → variant hit rects memo."""
+    return _caches().number_hits.setdefault(page.number, {})
+
+
+def _anchor_results() -> dict[tuple, tuple]:
+    """Return this run's (mutable) resolve_anchor_rect() memo."""
+    return _caches().anchor_results
+
+
+def _page_word_y_index(page) -> dict[int, tuple[array, array]]:
+    """Return, for word edges 1 (y0) and 3 (y1), the sorted coordinates and
+    the matching positions in _page_words().
+
+    Both are flat typed arrays (struct-of-arrays), so range scans compare
+    raw doubles without unpacking the word tuples."""
+    y_cache = _caches().word_y_index
+    cached = y_cache.get(page.number)
+    if cached is not None:
+        return cached
+    words = _page_words(page)
+    index: dict[int, tuple[array, array]] = {}
+    for edge in (1, 3):
+        order = sorted(range(len(words)), key=lambda i: words[i][edge])
+        index[edge] = (array("d", [words[i][edge] for i in order]), array("l", order))
+    y_cache[page.number] = index
+    return index
 
 
 def _page_dict(page):
-    """OCR-aware replacement for page.get_text('dict')."""
+    """OCR-aware replacement for page.get_text('dict'), cached per page."""
+    dict_cache = _caches().dicts
+    cached = dict_cache.get(page.number)
+    if cached is not None:
+        return cached
     ocr_page, tp = _get_ocr_page_and_tp(page)
     if tp is not None:
-        return ocr_page.get_text("dict", textpage=tp)
-    return page.get_text("dict")
+        data = ocr_page.get_text("dict", textpage=tp)
+    else:
+        data = page.get_text("dict", flags=_DICT_FLAGS)
+    dict_cache[page.number] = data
+    return data
 
 
 def _page_text(page):
-    """OCR-aware replacement for page.get_text('text')."""
+    """OCR-aware replacement for page.get_text('text'), cached per page."""
+    text_cache = _caches().texts
+    cached = text_cache.get(page.number)
+    if cached is not None:
+        return cached
     ocr_page, tp = _get_ocr_page_and_tp(page)
     if tp is not None:
-        return ocr_page.get_text("text", textpage=tp)
-    return page.get_text("text")
+        text = ocr_page.get_text("text", textpage=tp)
+    else:
+        text = page.get_text("text")
+    text_cache[page.number] = text
+    return text
+
+
+def _page_lines(page) -> list[tuple[str, fitz.Rect]]:
+    """Return (line_text, line_rect) for every non-empty text line, cached per page."""
+    lines_cache = _caches().lines
+    cached = lines_cache.get(page.number)
+    if cached is not None:
+        return cached
+    lines: list[tuple[str, fitz.Rect]] = []
+    for block in _page_dict(page).get("blocks", []) or []:
+        for line in block.get("lines", []) or []:
+            spans = line.get("spans", []) or []
+            line_text = "".join((s.get("text") or "") for s in spans).strip()
+            bbox = line.get("bbox")
+            if not line_text or not bbox:
+                continue
+            lines.append((line_text, fitz.Rect(bbox)))
+    lines_cache[page.number] = lines
+    return lines
+
+
+def _page_line_tokens(page) -> list[tuple]:
+    """Return (line_text, line_rect, norm, compact_norm, tokens, token_set) per line.
+
+    norm is _normalize_text_for_match(line_text); compact_norm is norm with
+    commas and spaces removed (for number containment checks).  Cached per page.
+    """
+    cache = _caches().line_tokens
+    cached = cache.get(page.number)
+    if cached is not None:
+        return cached
+    entries = []
+    for line_text, line_rect in _page_lines(page):
+        norm = _normalize_text_for_match(line_text)
+        tokens = _tokenize(line_text)
+        entries.append((
+            line_text, line_rect, norm,
+            norm.translate(_NUM_STRIP_TABLE),
+            tokens, set(tokens),
+        ))
+    cache[page.number] = entries
+    return entries
+
+
+def _page_spans(page) -> list[tuple[fitz.Rect, float]]:
+    """Return (span_rect, font_size) for every sized text span, cached per page."""
+    spans_cache = _caches().spans
+    cached = spans_cache.get(page.number)
+    if cached is not None:
+        return cached
+    spans: list[tuple[fitz.Rect, float]] = []
+    for block in _page_dict(page).get("blocks", []) or []:
+        for line in block.get("lines", []) or []:
+            for span in line.get("spans", []) or []:
+                bbox = span.get("bbox")
+                size = span.get("size") or 0
+                if not bbox or size <= 0:
+                    continue
+                spans.append((fitz.Rect(bbox), float(size)))
+    spans_cache[page.number] = spans
+    return spans
 
 
 def _page_has_significant_images(page) -> bool:
@@ -91,24 +429,45 @@ def _page_has_significant_images(page) -> bool:
 
 
 def _init_ocr_cache(doc, allowed_pages: list[int]) -> None:
-    """Scan pages for significant images and mark them for lazy OCR.
+    """Start fresh page caches for this thread and mark pages for lazy OCR.
 
-    Does NOT create TextPage objects here — they hold a weak-ref to their
-    parent page which is GC'd after this loop.  Instead populates _ocr_pages
-    so _get_ocr_page_and_tp() creates them lazily at search time.
+    Does NOT create TextPage objects here — OCR is expensive and only pages
+    that are actually searched need it.  Instead populates ocr_pages so
+    _get_ocr_page_and_tp() creates them lazily at search time.
     """
-    global _ocr_pages, _ocr_tp_cache
-    _ocr_pages = set()
-    _ocr_tp_cache = {}
+    caches = _local.caches = _PageCaches()
 
     for p in allowed_pages:
         try:
-            page = doc[p - 1]
+            page = _load_page(doc, p)
         except Exception:
             continue
         if _page_has_significant_images(page):
-            _ocr_pages.add(page.number)
+            caches.ocr_pages.add(page.number)
             logger.info(f"  Page {p} marked for OCR (has significant images)")
 
-    if _ocr_pages:
-        logger.info(f"  {len(_ocr_pages)} page(s) will be OCR'd on first access")
+    if caches.ocr_pages:
+        logger.info(f"  {len(caches.ocr_pages)} page(s) will be OCR'd on first access")
+
+
+def _release_page_caches() -> None:
+    """Drop this thread's page caches (and the page objects they pin)."""
+    _local.caches = None
+
+
+def _warm_page_caches(doc, allowed_pages: list[int]) -> None:
+    """Extract and index the words and lines of every allowed page up front.
+
+    PyMuPDF documents must not be shared across threads, so anchor
+    resolution stays sequential; instead all page parsing happens here, once,
+    before any score label or underline is drawn.  Later lookups are then
+    pure dictionary hits and every page is indexed from unmodified content.
+    """
+    for p in allowed_pages:
+        try:
+            page = _load_page(doc, p)
+            _page_words(page)
+            _page_word_index(page)
+            _page_lines(page)
+        except Exception as e:
+            logger.debug(f"  Could not pre-read page {p}: {e}")
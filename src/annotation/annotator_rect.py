@@ -7,16 +7,25 @@
 #   - Heading and numeric-content detection
 #   - Header redirection (move anchor to next numeric row)
 #   - Same-line check, next-numeric-line search, number-word refinement
+#   - Y-bucketed index of placed label boxes (collision checks)
 
 import re
+from bisect import bisect_left, bisect_right
 from typing import Iterable, Optional
 
 import fitz
 
 from .annotator_config import CONFIG
-from .annotator_ocr import _page_words, _page_dict, _page_search
+from .annotator_ocr import _page_words, _page_lines, _page_search, _page_word_y_index, _page_size, _page_shape
 from .annotator_text import _normalize_text_for_match, _strip_llm_artifacts
 
+_DIGIT_RE = re.compile(r"\d")
+_NONZERO_DIGIT_RE = re.compile(r"[1-9]")
+_NON_DIGIT_RE = re.compile(r"\D")
+_CURRENCY_PERCENT_RE = re.compile(r"£|\$|%")
+_WORKING_REF_RE = re.compile(r"[A-Za-z]{1,3}\d{1,3}")
+_PLAIN_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
 
 # ── Underline drawing ──────────────────────────────────────────────────────────
 
@@ -31,20 +40,18 @@ def _draw_underline_for_rect(page, rect: fitz.Rect, phrase_only: bool = False) -
     if not page or not rect:
         return
     line_rect = _expand_rect_to_line(page, rect)
+    page_w = _page_size(page)[0]
     if phrase_only:
         underline_start = max(rect.x0 - 1, 10)
-        underline_end = min(rect.x1 + 1, page.rect.width - 10)
+        underline_end = min(rect.x1 + 1, page_w - 10)
     else:
         underline_rect = _expand_rect_to_row(page, rect)
         underline_start = max(underline_rect.x0, 10)
-        underline_end = min(underline_rect.x1, page.rect.width - 50)
+        underline_end = min(underline_rect.x1, page_w - 50)
     underline_y = line_rect.y1 + 2
-    page.draw_line(
-        (underline_start, underline_y),
-        (underline_end, underline_y),
-        color=CONFIG['underline_color'],
-        width=0.8,
-    )
+    shape = _page_shape(page)
+    shape.draw_line((underline_start, underline_y), (underline_end, underline_y))
+    shape.finish(color=CONFIG['underline_color'], width=0.8, closePath=False)
 
 
 # ── Line / row extraction ──────────────────────────────────────────────────────
@@ -52,17 +59,10 @@ def _draw_underline_for_rect(page, rect: fitz.Rect, phrase_only: bool = False) -
 def _iter_page_lines(page) -> Iterable[tuple[str, fitz.Rect]]:
     """Yield (line_text, line_rect) for every text line on the page."""
     try:
-        data = _page_dict(page)
-        for block in data.get("blocks", []) or []:
-            for line in block.get("lines", []) or []:
-                spans = line.get("spans", []) or []
-                line_text = "".join((s.get("text") or "") for s in spans).strip()
-                bbox = line.get("bbox")
-                if not line_text or not bbox:
-                    continue
-                yield line_text, fitz.Rect(bbox)
+        lines = _page_lines(page)
     except Exception:
         return
+    yield from lines
 
 
 def _expand_rect_to_line(page, rect: fitz.Rect) -> fitz.Rect:
@@ -98,14 +98,15 @@ def _expand_rect_to_row(page, rect: fitz.Rect) -> fitz.Rect:
     tol = max(CONFIG.get('y_tolerance', 6), 6)
     target_yc = (rect.y0 + rect.y1) / 2
 
-    row_rect: Optional[fitz.Rect] = None
-    for w in words:
-        wrect = fitz.Rect(w[:4])
-        w_yc = (wrect.y0 + wrect.y1) / 2
-        if abs(w_yc - target_yc) > tol:
-            continue
-        row_rect = wrect if row_rect is None else row_rect | wrect
-
+    # Reduce the raw word tuples to one bbox instead of building a Rect per
+    # word and folding them with |.
+    row = [w for w in words if abs((w[1] + w[3]) / 2 - target_yc) <= tol]
+    if not row:
+        return _expand_rect_to_line(page, rect)
+    row_rect = fitz.Rect(
+        min(w[0] for w in row), min(w[1] for w in row),
+        max(w[2] for w in row), max(w[3] for w in row),
+    )
     return row_rect or _expand_rect_to_line(page, rect)
 
 
@@ -133,6 +134,15 @@ def _box_overlaps_page_text(page, box: fitz.Rect) -> bool:
     return False
 
 
+def _words_near_y(page, edge: int, y: float, tol: float) -> list[int]:
+    """Positions (in page order) of words whose y0 (*edge* 1) or y1 (*edge* 3)
+    lies within *tol* of *y*."""
+    coords, positions = _page_word_y_index(page)[edge]
+    lo = bisect_left(coords, y - tol - 1e-6)
+    hi = bisect_right(coords, y + tol + 1e-6)
+    return sorted(positions[j] for j in range(lo, hi) if abs(coords[j] - y) <= tol)
+
+
 # ── Heading / numeric content detection ───────────────────────────────────────
 
 def _is_heading_like(text: str) -> bool:
@@ -154,7 +164,7 @@ def _is_heading_like(text: str) -> bool:
     if t.startswith("the basic eps"):
         return True
 
-    if not re.search(r"\d", t) and len(t.split()) <= 12:
+    if not _DIGIT_RE.search(t) and len(t.split()) <= 12:
         heading_keywords = (
             "calculated",
             "as follows",
@@ -178,39 +188,69 @@ def _row_has_numeric_content(page, rect: fitz.Rect) -> bool:
     if not rect:
         return False
 
+    tol = max(CONFIG.get('y_tolerance', 6), 6)
     try:
         words = _page_words(page)
+        candidates = set(_words_near_y(page, 1, rect.y0, tol))
+        candidates.update(_words_near_y(page, 3, rect.y1, tol))
     except Exception:
         return False
 
-    tol = max(CONFIG.get('y_tolerance', 6), 6)
-
     def _has_nonzero_digit(s: str) -> bool:
-        return bool(re.search(r"[1-9]", s or ""))
+        return bool(_NONZERO_DIGIT_RE.search(s or ""))
 
     def _is_value_like(token: str) -> bool:
         t = (token or "").strip()
         if not t:
             return False
         # Short code labels like W1, A12 are not values
-        if re.fullmatch(r"[A-Za-z]{1,3}\d{1,3}", t):
+        if _WORKING_REF_RE.fullmatch(t):
             return False
         # Currency/percent: only count if a non-zero digit is present
-        if re.search(r"£|\$|%", t) and re.search(r"\d", t):
-            digits = re.sub(r"\D", "", t)
+        if _CURRENCY_PERCENT_RE.search(t) and _DIGIT_RE.search(t):
+            digits = _NON_DIGIT_RE.sub("", t)
             return _has_nonzero_digit(digits)
         # Pure numeric-ish values (allow commas, parens, minus)
         t2 = t.replace(",", "").strip("()")
-        if re.fullmatch(r"-?\d+(?:\.\d+)?", t2):
-            digits = re.sub(r"\D", "", t2)
+        if _PLAIN_NUMBER_RE.fullmatch(t2):
+            digits = _NON_DIGIT_RE.sub("", t2)
             return len(digits) >= 2 and _has_nonzero_digit(digits)
         return False
 
-    for w in words:
-        wrect = fitz.Rect(w[:4])
-        if abs(wrect.y0 - rect.y0) <= tol or abs(wrect.y1 - rect.y1) <= tol:
-            txt = (w[4] or "").strip()
-            if _is_value_like(txt):
+    for i in sorted(candidates):
+        txt = (words[i][4] or "").strip()
+        if _is_value_like(txt):
+            return True
+    return False
+
+
+# ── Placed-box index ───────────────────────────────────────────────────────────
+#
+# placed_lines_per_page maps page_idx → {y_bucket: [box, ...]}.  A box is
+# registered under every bucket its vertical extent touches, so a collision
+# query only inspects boxes sharing a bucket instead of every box on the page.
+
+def _box_buckets(box: fitz.Rect) -> range:
+    """Return the y-buckets spanned by *box*."""
+    step = float(CONFIG['y_tolerance'])
+    return range(int(box.y0 // step), int(box.y1 // step) + 1)
+
+
+def _add_placed_box(placed_lines_per_page: dict, page_idx: int, box: fitz.Rect) -> None:
+    """Register *box* as occupied on *page_idx*."""
+    buckets = placed_lines_per_page.setdefault(page_idx, {})
+    for b in _box_buckets(box):
+        buckets.setdefault(b, []).append(box)
+
+
+def _collides_with_placed(placed_lines_per_page: Optional[dict], page_idx: int, box: fitz.Rect) -> bool:
+    """Return True if *box* intersects any box already placed on *page_idx*."""
+    buckets = (placed_lines_per_page or {}).get(page_idx)
+    if not buckets:
+        return False
+    for b in _box_buckets(box):
+        for other in buckets.get(b, ()):
+            if box.intersects(other):
                 return True
     return False
 
@@ -237,8 +277,8 @@ def _find_next_numeric_line(page, from_rect: fitz.Rect, max_down: float = 140.0)
         if line_rect.y0 > from_rect.y1 + max_down:
             break
         t = _normalize_text_for_match(line_text)
-        digits = re.sub(r"\D", "", t)
-        if digits and re.search(r"[1-9]", digits):
+        digits = _NON_DIGIT_RE.sub("", t)
+        if digits and _NONZERO_DIGIT_RE.search(digits):
             return line_rect
     return None
 
@@ -251,14 +291,13 @@ def _refine_to_numberish_word_on_line(page, line_rect: fitz.Rect) -> Optional[fi
         return None
     words = _page_words(page)
     candidates: list[tuple[fitz.Rect, str]] = []
-    for w in words:
+    for i in _words_near_y(page, 1, line_rect.y0, CONFIG['y_tolerance']):
+        w = words[i]
         rect = fitz.Rect(w[:4])
-        if abs(rect.y0 - line_rect.y0) > CONFIG['y_tolerance']:
-            continue
         txt = (w[4] or "").strip()
         if not txt:
             continue
-        if re.search(r"\d", txt) or re.search(r"£|\$|%", txt):
+        if _DIGIT_RE.search(txt) or _CURRENCY_PERCENT_RE.search(txt):
             candidates.append((rect, txt))
 
     if not candidates:
@@ -287,13 +326,16 @@ def _redirect_if_header_like(
     line_text = _line_text_for_rect(page, line_rect)
 
     norm = _normalize_text_for_match(line_text)
-    short_label = len(norm.split()) <= 3 and len(norm) <= 24
-    wp_ref = any(re.fullmatch(r"[a-z]{1,3}\d{1,3}", tok) for tok in norm.split())
-    has_any_digit = bool(re.search(r"\d", norm))
+    norm_tokens = norm.split()
+    short_label = len(norm_tokens) <= 3 and len(norm) <= 24
+    # norm is lowercased, so the mixed-case working-reference pattern
+    # matches exactly the same tokens as a lowercase-only one.
+    wp_ref = any(_WORKING_REF_RE.fullmatch(tok) for tok in norm_tokens)
+    has_any_digit = bool(_DIGIT_RE.search(norm))
     has_digit_besides_wp = any(
-        re.search(r"\d", tok)
-        for tok in norm.split()
-        if not re.fullmatch(r"[a-z]{1,3}\d{1,3}", tok)
+        _DIGIT_RE.search(tok)
+        for tok in norm_tokens
+        if not _WORKING_REF_RE.fullmatch(tok)
     )
 
     row_has_values = _row_has_numeric_content(page, line_rect)
@@ -1,10 +1,42 @@
 # ==================== TEXT NORMALIZATION & PARSING UTILITIES ====================
 
+import functools
 import re
 from typing import Optional
 
 from .annotator_config import STOPWORDS
 
+_LLM_ARTIFACT_RE = re.compile(r"\[\.\.\.\]|\\n|\\\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+_PER_CENT_RE = re.compile(r"\bper\s*cent\b", re.IGNORECASE)
+_PERCENT_WORD_RE = re.compile(r"\bpercent\b", re.IGNORECASE)
+_PERCENT_SPACING_RE = re.compile(r"\s*%\s*")
+_NON_TOKEN_CHARS_RE = re.compile(r"[^a-z0-9£$%.,/()\- ]+")
+_FRAGMENT_SPLIT_RE = re.compile(r"\n|;|\|")
+# Deletes thousands separators (commas and spaces) from numbers in one pass.
+_NUM_STRIP_TABLE = str.maketrans("", "", ", ")
+
+
+def _str_lru_cache(maxsize: int = 4096):
+    """lru_cache for pure text helpers whose first argument is normally a str.
+
+    Evidence, anchors and comments repeat heavily within a run, so results
+    are memoised; non-str first arguments bypass the cache instead of
+    failing on an unhashable key.
+    """
+    def decorator(fn):
+        cached = functools.lru_cache(maxsize=maxsize)(fn)
+
+        @functools.wraps(fn)
+        def wrapper(text, *args, **kwargs):
+            if isinstance(text, str):
+                return cached(text, *args, **kwargs)
+            return fn(text, *args, **kwargs)
+
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
+
 
 def _strip_llm_artifacts(text: str) -> str:
     """Remove common LLM-generated noise from a string."""
@@ -12,8 +44,8 @@ def _strip_llm_artifacts(text: str) -> str:
         return ""
     cleaned = text
     cleaned = cleaned.replace("\u00a0", " ")
-    cleaned = re.sub(r"\[\.\.\.\]|\\n|\\\n", " ", cleaned)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    cleaned = _LLM_ARTIFACT_RE.sub(" ", cleaned)
+    cleaned = _WHITESPACE_RE.sub(" ", cleaned).strip()
     return cleaned
 
 
@@ -30,6 +62,7 @@ def _line_key(page_num: int, y: float, granularity: float = 2.0) -> tuple[int, i
     return int(page_num), int(yy // float(granularity))
 
 
+@_str_lru_cache()
 def _normalize_text_for_match(text: str) -> str:
     """Lowercase, strip artifacts, and normalise symbols for fuzzy comparison."""
     if not text or not isinstance(text, str):
@@ -37,7 +70,7 @@ def _normalize_text_for_match(text: str) -> str:
     cleaned = _strip_llm_artifacts(text)
     cleaned = cleaned.replace("×", "x")
     cleaned = cleaned.replace("–", "-").replace("—", "-")
-    cleaned = re.sub(r"\s+", " ", cleaned).strip().lower()
+    cleaned = _WHITESPACE_RE.sub(" ", cleaned).strip().lower()
     return cleaned
 
 
@@ -69,7 +102,7 @@ def _build_anchor_variations(text: str) -> list[str]:
     if not text or not isinstance(text, str):
         return []
 
-    base = re.sub(r"\s+", " ", text.replace("|", " ")).strip()
+    base = _WHITESPACE_RE.sub(" ", text.replace("|", " ")).strip()
     if not base:
         return []
 
@@ -77,19 +110,19 @@ def _build_anchor_variations(text: str) -> list[str]:
     norm = _normalize_text_for_match(base)
 
     if "percent" in norm or "per cent" in norm:
-        v = re.sub(r"\bper\s*cent\b", "%", base, flags=re.IGNORECASE)
-        v = re.sub(r"\bpercent\b", "%", v, flags=re.IGNORECASE)
-        v = re.sub(r"\s*%\s*", "%", v)
+        v = _PER_CENT_RE.sub("%", base)
+        v = _PERCENT_WORD_RE.sub("%", v)
+        v = _PERCENT_SPACING_RE.sub("%", v)
         variants.append(v)
 
     if "%" in base:
-        variants.append(re.sub(r"%", " percent", base))
-        variants.append(re.sub(r"%", " per cent", base))
+        variants.append(base.replace("%", " percent"))
+        variants.append(base.replace("%", " per cent"))
 
     out: list[str] = []
     seen: set[str] = set()
     for v in variants:
-        vv = re.sub(r"\s+", " ", v).strip()
+        vv = _WHITESPACE_RE.sub(" ", v).strip()
         if not vv:
             continue
         key = vv.lower()
@@ -107,7 +140,7 @@ def _tokenize(text: str) -> list[str]:
     accounting symbols (£, $, %, etc.).
     """
     norm = _normalize_text_for_match(text)
-    norm = re.sub(r"[^a-z0-9£$%.,/()\- ]+", " ", norm)
+    norm = _NON_TOKEN_CHARS_RE.sub(" ", norm)
     tokens = [t for t in norm.split() if len(t) > 2 and t not in STOPWORDS]
     return tokens
 
@@ -122,7 +155,7 @@ def _build_candidate_fragments(evidence_text: str) -> list[str]:
 
     DRY helper shared by place_score_near_anchor and the holistic annotation loop.
     """
-    parts = [p.strip() for p in re.split(r"\n|;|\|", evidence_text) if p and p.strip()]
+    parts = [p.strip() for p in _FRAGMENT_SPLIT_RE.split(evidence_text) if p and p.strip()]
     parts = [p for p in parts if len(p) >= 6]
     seen: set[str] = set()
     unique: list[str] = []
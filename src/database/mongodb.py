@@ -1,3 +1,4 @@
+import functools
 import os
 from contextlib import contextmanager
 from threading import Lock
@@ -45,6 +46,17 @@ class MongoDBConfig:
             "socketTimeoutMS": 20000,
             "retryWrites": True,
             "retryReads": True,
+            # Keep a warm pool so concurrent grading sessions reuse connections
+            # instead of paying a TLS handshake per request.
+            "maxPoolSize": 50,
+            "minPoolSize": 5,
+            "maxIdleTimeMS": 60000,
+            "waitQueueTimeoutMS": 5000,
+            # zstd when python-zstandard is installed, zlib otherwise; the
+            # question/rubric JSON compresses well on the wire.
+            "compressors": "zstd,zlib",
+            "zlibCompressionLevel": 6,
+            "appname": "pac_grader",
             # "tls": True,               # usually automatic with +srv
             # "tlsAllowInvalidCertificates": False,
         }
@@ -53,15 +65,14 @@ class MongoDBConfig:
 class MongoDBConnection:
     _client: Optional[MongoClient] = None
     _db: Optional[Database] = None
-    _lock = Lock()  # protects initialization
+    _lock = Lock()  # serialises the (slow-path) connect
 
     @classmethod
     def _initialize(cls) -> None:
-        if cls._client is not None:
-            return
-
+        # Only reached on a _build_client() cache miss; the lock makes
+        # concurrent first callers share one client.
         with cls._lock:
-            if cls._client is not None:  # double-checked locking
+            if cls._client is not None:
                 return
 
             logger.info("Initializing MongoDB connection...")
@@ -109,17 +120,11 @@ class MongoDBConnection:
 
     @classmethod
     def get_client(cls) -> MongoClient:
-        cls._initialize()
-        if cls._client is None:
-            raise RuntimeError("MongoDB client not initialized")
-        return cls._client
+        return _build_client()[0]
 
     @classmethod
     def get_db(cls) -> Database:
-        cls._initialize()
-        if cls._db is None:
-            raise RuntimeError("MongoDB database not initialized")
-        return cls._db
+        return _build_client()[1]
 
     @classmethod
     def get_collection(cls, name: str = "pac_questions") -> Collection:
@@ -136,17 +141,48 @@ class MongoDBConnection:
             finally:
                 cls._client = None
                 cls._db = None
+                _build_client.cache_clear()
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        """Drop the inherited client in a forked child without closing it.
+
+        The parent still owns those sockets; the child lazily builds its own
+        client on first use.  The lock is re-created too: if another parent
+        thread held it mid-_initialize() at fork time, the child's copy would
+        stay locked forever.
+        """
+        cls._lock = Lock()
+        cls._client = None
+        cls._db = None
+        _build_client.cache_clear()
 
     @classmethod
     @contextmanager
     def context(cls) -> Generator[Database, None, None]:
-        cls._initialize()
         try:
             yield cls.get_db()
         finally:
             pass
 
 
+@functools.cache
+def _build_client() -> tuple[MongoClient, Database]:
+    """Return the process-wide (client, database) pair.
+
+    The cache hit is the hot path for every get_db()/get_collection() call;
+    misses fall through to MongoDBConnection._initialize().
+    """
+    MongoDBConnection._initialize()
+    if MongoDBConnection._client is None or MongoDBConnection._db is None:
+        raise RuntimeError("MongoDB client not initialized")
+    return MongoDBConnection._client, MongoDBConnection._db
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MongoDBConnection._reset_after_fork)
+
+
 # Convenience exports
 get_db = MongoDBConnection.get_db
 get_collection = MongoDBConnection.get_collection
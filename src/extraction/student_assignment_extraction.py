@@ -1,7 +1,8 @@
 import llm_setup
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from pymongo.collection import Collection
 
@@ -23,11 +24,13 @@ class StudentAssignmentExtractor:
         pages: List[int],
         student_name: Optional[str] = None,
         question_number: Optional[str] = None,
+        refresh_cache: bool = False,
     ):
         self.pdf_path = pdf_path
         self.pages = pages
         self.student_name = student_name
         self.question_number = question_number
+        self.refresh_cache = refresh_cache
         self.collection: Collection = get_collection(self.COLLECTION_NAME)
 
     def _extract_with_vision(self) -> dict:
@@ -38,6 +41,7 @@ class StudentAssignmentExtractor:
                 self.pages,
                 model_name=llm_setup.LLM_EXTRACTION_MODEL,
                 render_dpi=llm_setup.LLM_PDF_RENDER_DPI,
+                refresh_cache=self.refresh_cache,
             )
             data = extractor.extract(
                 instruction_prompt=prompt,
@@ -70,5 +74,37 @@ def extract_assignment_pipeline(
     pages: List[int],
     student_name: Optional[str] = None,
     question_number: Optional[str] = None,
+    refresh_cache: bool = False,
 ) -> Optional[str]:
-    return StudentAssignmentExtractor(pdf_path, pages, student_name, question_number).run()
+    return StudentAssignmentExtractor(
+        pdf_path, pages, student_name, question_number, refresh_cache=refresh_cache,
+    ).run()
+
+
+def extract_assignments_batch(
+    pdf_path: str,
+    items: List[Tuple[str, List[int]]],
+    student_name: Optional[str] = None,
+    max_concurrency: int = 8,
+    refresh_cache: bool = False,
+) -> List[Optional[str]]:
+    """Extract several questions of one student PDF concurrently.
+
+    *items* holds (question_number, pages) pairs; returns the saved _ids in
+    the same order (None for a failed question).  Each extraction is one
+    vision LLM round trip, so the questions run on a thread pool instead of
+    back to back.  Only the LLM calls overlap: page rendering either goes to
+    the render process pool or, for short page sets, runs in-process under
+    MUPDF_LOCK, one question at a time.
+    """
+    if not items:
+        return []
+
+    def _one(item: Tuple[str, List[int]]) -> Optional[str]:
+        question_number, pages = item
+        return extract_assignment_pipeline(
+            pdf_path, pages, student_name, question_number, refresh_cache=refresh_cache,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(items)))) as pool:
+        return list(pool.map(_one, items))
@@ -2,18 +2,38 @@ import json
 import re
 import os
 import ast
+import copy
+import functools
 import math
 import traceback
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Any, Tuple
 from bson import ObjectId
 from pydantic import BaseModel, Field
 from prompts.grading_prompts import grade_prompt, holistic_grade_prompt
-from llm_setup import llm_grader
+from llm_setup import llm_grader, GRADING_PROVIDER, LLM_GRADER_MODEL
 from logging_config import logger
 from schemas.student_grades import StudentGradeDocument
 from database.mongodb import get_collection
 from errors import GradingError, classify_error
+from utils.llm_cache import CachedRunnable
+
+# Strips commas and spaces when comparing numbers written with separators.
+_NUM_STRIP_TABLE = str.maketrans("", "", ", ")
+
+# Student sub-part labels: bare letter/roman ('a)', '(ii)') vs numeric ('4.2').
+_LETTER_LABEL_RE = re.compile(r"^[\(\[]?([A-Za-z]+|[ivxIVX]+)[\)\]\.]?$")
+_NUMERIC_LABEL_RE = re.compile(r"^\d+(?:\.\d+)*[)\.]?$")
+
+# Question-level label parsing (_format_student_for_prompt), run per sub-part.
+_SUB_SECTION_LABEL_RE = re.compile(r"(?:issue|part|section|topic)\s*[-:]?\s*\d", re.IGNORECASE)
+_DASH_LABEL_RE = re.compile(r"^\d+\s*-")
+_QUESTION_ID_RE = re.compile(r"^(?:Q(?:uestion)?\.?\s*[-:]?\s*)?(\d+)", re.IGNORECASE)
+
+# Evidence normalisation, run per quote by the grading guardrails.
+_WHITESPACE_RE = re.compile(r"\s+")
+_EVIDENCE_NOISE_RE = re.compile(r"[^a-z0-9%/().,\- ]+")
 
 
 class NotRequiredPoint(BaseModel):
@@ -75,10 +95,67 @@ class HolisticGradingResponse(BaseModel):
     comments: list[str] = Field(default_factory=list, description="Feedback comments")
 
 
+@dataclass(slots=True)
+class GradingSession:
+    """Question paper and model answer shared by every student in a batch.
+
+    Built once by prepare_grading_session(): both documents are fetched once.
+    The first student for each (question_number, question_type) cleans and
+    flattens them; later students reuse those very payload objects (see
+    StudentGrader._load_clean_data), so serialize() can match them by
+    identity and every prompt carries a byte-identical static block.
+    """
+    questions_id: Optional[str]
+    model_answers_id: Optional[str]
+    questions_doc: Optional[dict] = None
+    model_doc: Optional[dict] = None
+    # (question_number, question_type) → (q_clean, m_clean, grader rubric state)
+    prepared: dict[tuple, tuple] = field(default_factory=dict, repr=False)
+    # (name, id(data)) → (data, serialized); data is held so its id stays valid.
+    _serialized: dict[tuple, tuple[Any, Tuple[str, str]]] = field(default_factory=dict, repr=False)
+
+    def serialize(self, name: str, data: Any) -> Tuple[str, str]:
+        """Return _serialize_for_prompt(data), reusing the result for this very *data* object."""
+        key = (name, id(data))
+        hit = self._serialized.get(key)
+        if hit is not None and hit[0] is data:
+            return hit[1]
+        result = StudentGrader._serialize_for_prompt(data)
+        self._serialized[key] = (data, result)
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _structured_grader(schema: type[BaseModel]) -> Any:
+    """llm_grader bound to *schema*, built once per process instead of per student."""
+    return llm_grader.with_structured_output(schema)
+
+
 class StudentGrader:
 
     COLLECTION_NAME = "student_grades"
 
+    # Only these fields go to LLM — metadata is completely excluded.
+    # They double as the Mongo projection so unused fields never leave
+    # the server.
+    QUESTION_FIELDS = ["question_title", "description", "total_marks", "questions"]
+    MODEL_FIELDS = ["question_title", "description", "total_marks", "answers"]
+    STUDENT_FIELDS = ["question", "sub_parts"]
+
+    # Grader state derived from the model answer alone; a GradingSession
+    # stores it with the prepared payload so later students can restore it.
+    _SESSION_STATE_ATTRS = (
+        "_criteria_were_synthesized",
+        "_holistic_grading",
+        "_holistic_sub_questions",
+        "_allowed_criteria_last_run",
+        "_criterion_max_map_last_run",
+        "_criterion_category_map_last_run",
+        "_exact_match_criteria_last_run",
+        "_rubric_criteria_order_last_run",
+        "_rubric_position_last_run",
+    )
+
     def __init__(
         self,
         student_name: str,
@@ -87,6 +164,8 @@ class StudentGrader:
         model_answers_id: Optional[str],
         student_answers_id: str,
         question_type: str = "numerical",
+        session: Optional[GradingSession] = None,
+        refresh_cache: bool = False,
     ):
         self.student_name = student_name
         self.question_number = question_number
@@ -94,6 +173,8 @@ class StudentGrader:
         self.model_answers_id = model_answers_id
         self.student_answers_id = student_answers_id
         self.question_type = question_type  # "numerical" or "theoretical"
+        # Shared question/model payload when grading a batch (see prepare_grading_session).
+        self.session = session
 
         # Flag: True when marking criteria were synthesized from answer text
         # (no formal rubric provided). Used to relax strict guardrails.
@@ -138,23 +219,48 @@ class StudentGrader:
         # Prefer strict structured-output when the provider supports it.
         # Some providers/models (e.g., Grok / some Anthropic setups) may return
         # non-conforming JSON; we fall back to text parsing + one repair pass.
+        # Every chain is wrapped in CachedRunnable: identical prompts
+        # (re-grading the same student) are served from disk once a validated
+        # answer has been committed.  refresh_cache forces fresh LLM calls.
+        model_id = f"{GRADING_PROVIDER}:{LLM_GRADER_MODEL}"
+        cache_opts = {
+            "temperature": getattr(llm_grader, "temperature", None),
+            "refresh": refresh_cache,
+        }
         self.grade_chain_structured = None
         try:
-            structured_grader = llm_grader.with_structured_output(LLMGradingResponse)
-            self.grade_chain_structured = grade_prompt | structured_grader
+            structured_grader = _structured_grader(LLMGradingResponse)
+            self.grade_chain_structured = CachedRunnable(
+                grade_prompt | structured_grader, grade_prompt, model_id, "grade_structured",
+                **cache_opts,
+            )
         except Exception:
             self.grade_chain_structured = None
 
-        self.grade_chain_text = grade_prompt | llm_grader
+        self.grade_chain_text = CachedRunnable(
+            grade_prompt | llm_grader, grade_prompt, model_id, "grade_text", **cache_opts,
+        )
 
         # Holistic grading chains (used when no marking criteria exist).
         self.holistic_chain_structured = None
         try:
-            holistic_structured = llm_grader.with_structured_output(HolisticGradingResponse)
-            self.holistic_chain_structured = holistic_grade_prompt | holistic_structured
+            holistic_structured = _structured_grader(HolisticGradingResponse)
+            self.holistic_chain_structured = CachedRunnable(
+                holistic_grade_prompt | holistic_structured, holistic_grade_prompt,
+                model_id, "holistic_structured", **cache_opts,
+            )
         except Exception:
             self.holistic_chain_structured = None
-        self.holistic_chain_text = holistic_grade_prompt | llm_grader
+        self.holistic_chain_text = CachedRunnable(
+            holistic_grade_prompt | llm_grader, holistic_grade_prompt, model_id, "holistic_text",
+            **cache_opts,
+        )
+
+        # One-shot JSON repair passes: plain-string prompts sent to the grader.
+        self.grade_repair_chain = CachedRunnable(llm_grader, None, model_id, "grade_repair", **cache_opts)
+        self.holistic_repair_chain = CachedRunnable(
+            llm_grader, None, model_id, "holistic_repair", **cache_opts,
+        )
 
     @staticmethod
     def _extract_structured_args_from_message(output: Any) -> Optional[dict]:
@@ -206,9 +312,13 @@ class StudentGrader:
         cleaned = raw.strip()
         # Remove BOM / zero-width chars that can break json.loads at column 1
         cleaned = cleaned.lstrip("\ufeff\u200b\u200c\u200d")
-        cleaned = re.sub(r"^\s*```(?:json)?\s*", "", cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r"\s*```\s*$", "", cleaned)
-        cleaned = cleaned.strip()
+        # Drop a ```json / ``` fence around the payload.
+        cleaned = cleaned.lstrip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned[3:]
+            if cleaned[:4].lower() == "json":
+                cleaned = cleaned[4:]
+        cleaned = cleaned.strip().removesuffix("```").strip()
 
         if not cleaned:
             return ""
@@ -230,6 +340,55 @@ class StudentGrader:
 
         return cleaned[start:end].strip()
 
+    @staticmethod
+    def _loads_lenient_json(json_text: str) -> Any:
+        """json.loads with local fixes for common LLM slips, tried before the repair round trip.
+
+        Tolerates raw control characters inside strings and trailing commas.
+        Truncated output (an open string or unclosed brackets) raises instead
+        of being patched up, so it goes to the repair pass and never reaches
+        the cache as a partial grade.
+        """
+        try:
+            return json.loads(json_text, strict=False)
+        except json.JSONDecodeError:
+            pass
+
+        out: list[str] = []
+        closers: list[str] = []
+
+        def _drop_trailing_comma() -> None:
+            i = len(out) - 1
+            while i >= 0 and out[i].isspace():
+                i -= 1
+            if i >= 0 and out[i] == ",":
+                del out[i]
+
+        in_string = escaped = False
+        for ch in json_text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                closers.append("}")
+            elif ch == "[":
+                closers.append("]")
+            elif ch in "}]":
+                _drop_trailing_comma()
+                if closers and closers[-1] == ch:
+                    closers.pop()
+            out.append(ch)
+
+        if in_string or closers:
+            raise json.JSONDecodeError("Truncated JSON output", json_text, len(json_text))
+        return json.loads("".join(out), strict=False)
+
     def _extract_question_max_marks(self, questions_data: dict, main_grade: Optional[dict] = None) -> float:
         """Extract the total maximum marks for the question being graded.
 
@@ -1448,11 +1607,17 @@ class StudentGrader:
             self._rubric_criteria_order_last_run = ordered
             self._rubric_position_last_run = pos_map
 
-    def _fetch_doc(self, collection_name: str, doc_id: str) -> Optional[dict[str, Any]]:
-        """Fetch document by _id."""
+    @staticmethod
+    def _fetch_doc(
+        collection_name: str,
+        doc_id: str,
+        fields: Optional[list[str]] = None,
+    ) -> Optional[dict[str, Any]]:
+        """Fetch document by _id, optionally projected to *fields*."""
         try:
             coll = get_collection(collection_name)
-            doc = coll.find_one({"_id": ObjectId(doc_id)})
+            projection = dict.fromkeys(fields, 1) if fields else None
+            doc = coll.find_one({"_id": ObjectId(doc_id)}, projection)
             if not doc:
                 logger.warning(f"No document in {collection_name} for _id={doc_id}")
             return doc
@@ -1570,17 +1735,40 @@ class StudentGrader:
         return False
 
     def _load_clean_data(self) -> Tuple[dict, dict, dict]:
-        q_doc = self._fetch_doc("pac_questions", self.questions_id) if self.questions_id else {}
-        m_doc = self._fetch_doc("model_answers", self.model_answers_id) if self.model_answers_id else {}
-        s_doc = self._fetch_doc("student_assignments", self.student_answers_id)
+        q_fields = self.QUESTION_FIELDS
+        m_fields = self.MODEL_FIELDS
+        s_fields = self.STUDENT_FIELDS
+
+        session = self.session
+        if session is not None and (
+            session.questions_id != self.questions_id
+            or session.model_answers_id != self.model_answers_id
+        ):
+            session = None
 
+        s_doc = self._fetch_doc("student_assignments", self.student_answers_id, s_fields)
         if not s_doc:
             raise GradingError(f"No student answer found for _id={self.student_answers_id}")
+        s_clean = self._clean_for_llm(s_doc, s_fields)
+
+        prep_key = (str(self.question_number), self.question_type)
+        prepared = session.prepared.get(prep_key) if session is not None else None
+        if prepared is not None:
+            # Reuse the batch's payload objects (identity lets the session
+            # reuse their serialization) and the rubric state derived from them.
+            q_clean, m_clean, state = prepared
+            for attr, value in state.items():
+                setattr(self, attr, copy.copy(value))
+            return q_clean, m_clean, s_clean
+
+        if session is not None:
+            q_doc, m_doc = session.questions_doc, session.model_doc
+        else:
+            q_doc = self._fetch_doc("pac_questions", self.questions_id, q_fields) if self.questions_id else {}
+            m_doc = self._fetch_doc("model_answers", self.model_answers_id, m_fields) if self.model_answers_id else {}
 
-        # Only these fields go to LLM — metadata is completely excluded
-        q_clean = self._clean_for_llm(q_doc, ["question_title", "description", "total_marks", "questions"])
-        m_clean = self._clean_for_llm(m_doc, ["question_title", "description", "total_marks", "answers"])
-        s_clean = self._clean_for_llm(s_doc, ["question", "sub_parts"])
+        q_clean = self._clean_for_llm(q_doc, q_fields)
+        m_clean = self._clean_for_llm(m_doc, m_fields)
 
         # Grade holistically by combining all sub-answers/criteria into one payload.
         m_clean = self._flatten_model_answers(m_clean, q_clean)
@@ -1588,6 +1776,10 @@ class StudentGrader:
         # Cache rubric criteria for strict post-processing.
         self._cache_rubric_criteria(m_clean)
 
+        if session is not None:
+            state = {attr: copy.copy(getattr(self, attr)) for attr in self._SESSION_STATE_ATTRS}
+            session.prepared.setdefault(prep_key, (q_clean, m_clean, state))
+
         return q_clean, m_clean, s_clean
 
     def _normalize_floating_letter_labels(self, student_data: dict) -> dict:
@@ -1615,10 +1807,18 @@ class StudentGrader:
         if not main_q:
             return student_data
 
-        # Detect: do any bare letter-labels appear BEFORE the first numeric label?
-        letter_re = re.compile(r"^[\(\[]?([A-Za-z]+|[ivxIVX]+)[\)\]\.]?$")
-        numeric_re = re.compile(r"^\d+(?:\.\d+)*[)\.]?$")
+        letter_re = _LETTER_LABEL_RE
+        numeric_re = _NUMERIC_LABEL_RE
+
+        # Fast path: the student's labels already carry their parent (the
+        # common case), so there is nothing to combine or copy.
+        if not any(
+            isinstance(sp, dict) and letter_re.match(str(sp.get("question_number", "")).strip())
+            for sp in sub_parts
+        ):
+            return student_data
 
+        # Detect: do any bare letter-labels appear BEFORE the first numeric label?
         has_leading_letters = False
         for sp in sub_parts:
             if not isinstance(sp, dict):
@@ -1701,21 +1901,17 @@ class StudentGrader:
 
             # Skip sub-issue labels like "Issue-01 Peak State" — these are
             # sub-sections within a question, not question-level identifiers.
-            if re.match(r"(?:issue|part|section|topic)\s*[-:]?\s*\d", lab, re.IGNORECASE):
+            if _SUB_SECTION_LABEL_RE.match(lab):
                 return None
 
             # "N-" / "N- Topic name" style labels (e.g. "1-", "2- Tech limited:")
             # are scenario/sub-part labels within a question, NOT question IDs.
             # Returning None lets all such sub_parts pass through the filter.
-            if re.match(r"^\d+\s*-", lab):
+            if _DASH_LABEL_RE.match(lab):
                 return None
 
             # Extract question number from patterns like Q-01, Q.1, Q1, 1), 1.1)
-            m = re.match(
-                r"^(?:Q(?:uestion)?\.?\s*[-:]?\s*)?(\d+)",
-                lab,
-                re.IGNORECASE,
-            )
+            m = _QUESTION_ID_RE.match(lab)
             if m:
                 return str(int(m.group(1)))  # strip leading zeros: "01" -> "1"
 
@@ -1734,26 +1930,24 @@ class StudentGrader:
 
         sub_parts = student_data.get("sub_parts")
         if isinstance(sub_parts, list) and sub_parts:
-            # Check if any sub_part has a question-level label matching the target
-            any_matches = False
-            if target_qid:
-                for sp in sub_parts:
-                    if not isinstance(sp, dict):
-                        continue
-                    lab = str(sp.get("question_number", "")).strip()
-                    sp_qid = _extract_question_id(lab)
-                    if sp_qid == target_qid:
-                        any_matches = True
-                        break
-
-            in_relevant_block = False
+            # Resolve every label and its question id once; both passes below
+            # read from this list.
+            labelled: list[tuple[dict, str, str, Optional[str]]] = []
             for sp in sub_parts:
                 if not isinstance(sp, dict):
                     continue
-                sp_no = str(sp.get("question_number", "")).strip() or q or "(unknown)"
+                lab = str(sp.get("question_number", "")).strip()
+                sp_no = lab or q or "(unknown)"
+                labelled.append((sp, lab, sp_no, _extract_question_id(sp_no)))
 
+            # Check if any sub_part has a question-level label matching the target
+            any_matches = bool(target_qid) and any(
+                lab and sp_qid == target_qid for _, lab, _, sp_qid in labelled
+            )
+
+            in_relevant_block = False
+            for sp, _, sp_no, sp_qid in labelled:
                 if any_matches and target_qid:
-                    sp_qid = _extract_question_id(sp_no)
                     if sp_qid == target_qid:
                         in_relevant_block = True
                     elif sp_qid is not None and sp_qid != target_qid:
@@ -1794,8 +1988,8 @@ class StudentGrader:
     def _contains_number_variant(haystack: str, needle: str) -> bool:
         if not haystack or not needle:
             return False
-        h = haystack.replace(",", "").replace(" ", "")
-        n = needle.replace(",", "").replace(" ", "")
+        h = haystack.translate(_NUM_STRIP_TABLE)
+        n = needle.translate(_NUM_STRIP_TABLE)
         if n in h:
             return True
 
@@ -1847,7 +2041,7 @@ class StudentGrader:
         t = re.sub(r"\bpercent\b", "%", t)
 
         t = re.sub(r"\s+", " ", t).strip()
-        t = t.replace(",", "").replace(" ", "")
+        t = t.translate(_NUM_STRIP_TABLE)
 
         if not t:
             return None
@@ -2657,6 +2851,26 @@ class StudentGrader:
 
         return aggregated
 
+    @staticmethod
+    def _serialize_for_prompt(data: Any) -> Tuple[str, str]:
+        """Serialize *data* once as compact JSON for both the guardrail text and the prompt.
+
+        Returns (guardrail_text, prompt_json). Compact separators reduce prompt/token
+        bloat on large rubrics. When *data* is not JSON-serializable the guardrail
+        text falls back to str() and json.dumps is left to raise, as before.
+        """
+        try:
+            text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        except Exception:
+            return str(data), json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        return text, text
+
+    def _serialize_payload(self, name: str, data: Any) -> Tuple[str, str]:
+        """_serialize_for_prompt(), memoized on the batch session when there is one."""
+        if self.session is not None:
+            return self.session.serialize(name, data)
+        return self._serialize_for_prompt(data)
+
     def _run_holistic_grading(self, student_data: dict, model_data: dict, questions_data: dict) -> dict:
         """Execute holistic grading: compare full answers without per-criterion breakdown.
 
@@ -2666,20 +2880,13 @@ class StudentGrader:
         student_text = self._format_student_for_prompt(student_data)
         self._student_text_last_run = student_text or ""
 
-        compact_json_kwargs = {"ensure_ascii": False, "separators": (",", ":")}
-        try:
-            self._question_text_last_run = json.dumps(questions_data, **compact_json_kwargs)
-        except Exception:
-            self._question_text_last_run = str(questions_data)
-        try:
-            self._model_text_last_run = json.dumps(model_data, **compact_json_kwargs)
-        except Exception:
-            self._model_text_last_run = str(model_data)
+        self._question_text_last_run, questions_json = self._serialize_payload("questions", questions_data)
+        self._model_text_last_run, model_json = self._serialize_payload("model_data", model_data)
 
         payload = {
-            "model_data": json.dumps(model_data, **compact_json_kwargs),
+            "model_data": model_json,
             "chunks": student_text,
-            "questions": json.dumps(questions_data, **compact_json_kwargs),
+            "questions": questions_json,
         }
 
         debug_enabled = os.getenv("DEBUG_SAVE_LLM_OUTPUT", "").strip().lower() in {"1", "true", "yes", "y"}
@@ -2699,16 +2906,20 @@ class StudentGrader:
             json_text = self._extract_json_from_text(raw)
             if not json_text:
                 raise GradingError("Empty holistic grading output")
-            return json.loads(json_text)
+            return self._loads_lenient_json(json_text)
 
         # Attempt 1: structured output
         holistic_parsed = None
         try:
             if self.holistic_chain_structured is not None:
                 output = self.holistic_chain_structured.invoke(payload)
-                holistic_parsed = _coerce_holistic(output)
-                validated = HolisticGradingResponse(**holistic_parsed)
-                holistic_parsed = validated.model_dump()
+                if isinstance(output, HolisticGradingResponse):
+                    # Already validated by with_structured_output; dump once.
+                    holistic_parsed = output.model_dump()
+                else:
+                    holistic_parsed = _coerce_holistic(output)
+                    validated = HolisticGradingResponse(**holistic_parsed)
+                    holistic_parsed = validated.model_dump()
                 logger.info(f"Holistic grading complete → {self.student_name} (Q{self.question_number}) [structured]")
         except Exception as e:
             logger.warning(f"Holistic structured grading failed; falling back to text: {e}")
@@ -2729,11 +2940,14 @@ class StudentGrader:
                 "treating as parse failure and retrying via text path"
             )
             holistic_parsed = None
+        elif holistic_parsed is not None:
+            self.holistic_chain_structured.commit(output)
 
         # Attempt 2: text output + parse
+        text_output = None
         if holistic_parsed is None:
             try:
-                output = self.holistic_chain_text.invoke(payload)
+                output = text_output = self.holistic_chain_text.invoke(payload)
                 holistic_parsed = _coerce_holistic(output)
                 validated = HolisticGradingResponse(**holistic_parsed)
                 holistic_parsed = validated.model_dump()
@@ -2745,16 +2959,19 @@ class StudentGrader:
                     raise GradingError(
                         f"Text path returned score={holistic_parsed.get('score')} with 0 sub_grades"
                     )
+                self.holistic_chain_text.commit(output)
                 logger.info(f"Holistic grading complete → {self.student_name} (Q{self.question_number}) [text]")
             except Exception as e:
                 logger.warning(f"Holistic text grading failed; attempting repair: {e}")
                 holistic_parsed = None
 
-        # Attempt 3: repair
+        # Attempt 3: repair — only when there is model output to repair; an
+        # error message alone carries no student content to fix.
         if holistic_parsed is None:
+            raw_content = getattr(text_output, "content", None)
+            if not raw_content:
+                raise GradingError("Holistic grading step failed: no model output to repair")
             try:
-                raw_content = getattr(output, "content", None) if "output" in locals() else None
-                raw_content = raw_content if raw_content is not None else ""
                 repair_prompt = (
                     "You MUST return ONLY valid JSON (no markdown, no commentary). "
                     "Fix the following output to match this exact schema:\n"
@@ -2777,12 +2994,13 @@ class StudentGrader:
                     "OUTPUT TO FIX:\n"
                     f"{raw_content}"
                 )
-                fixed = llm_grader.invoke(repair_prompt)
+                fixed = self.holistic_repair_chain.invoke(repair_prompt)
                 fixed_content = getattr(fixed, "content", None) or str(fixed)
                 fixed_json = self._extract_json_from_text(str(fixed_content))
-                holistic_parsed = json.loads(fixed_json)
+                holistic_parsed = self._loads_lenient_json(fixed_json)
                 validated = HolisticGradingResponse(**holistic_parsed)
                 holistic_parsed = validated.model_dump()
+                self.holistic_repair_chain.commit(fixed)
                 logger.info(f"Holistic grading complete → {self.student_name} (Q{self.question_number}) [repaired]")
             except Exception as e2:
                 logger.error("Holistic grading chain failed", exc_info=True)
@@ -2991,34 +3209,70 @@ class StudentGrader:
         )
         return converted
 
+    @staticmethod
+    def _has_answer_text(student_data: dict) -> bool:
+        """Return True if any student sub-part answer contains a letter or digit."""
+        if not isinstance(student_data, dict):
+            return bool(str(student_data or "").strip())
+        sub_parts = student_data.get("sub_parts")
+        if not isinstance(sub_parts, list):
+            return True  # unknown shape — let the grader decide
+        for sp in sub_parts:
+            ans = sp.get("answer") if isinstance(sp, dict) else sp
+            if any(c.isalnum() for c in str(ans or "")):
+                return True
+        return False
+
+    def _zero_grades(self, questions_data: dict) -> dict:
+        """Standard grading response awarding 0 on every rubric criterion."""
+        breakdown = [
+            {
+                "criterion": crit,
+                "marks_awarded": 0.0,
+                "max_possible": float(self._criterion_max_map_last_run.get(crit, 0) or 0),
+                "reason": "No answer provided",
+                "evidence": [],
+            }
+            for crit in self._rubric_criteria_order_last_run
+        ]
+        return {
+            "grades": [{
+                "question_number": str(self.question_number),
+                "score": 0.0,
+                "total_marks": self._extract_question_max_marks(questions_data),
+                "comments": [],
+                "correct_words": [],
+                "breakdown": breakdown,
+                "not_required_points": [],
+            }]
+        }
+
     def _run_grading(self, student_data: dict, model_data: dict, questions_data: dict) -> dict:
         """Execute grading chain with clean content (holistic evaluation against all criteria)."""
 
+        # A blank script cannot earn marks; skip the LLM round trips entirely.
+        if not self._has_answer_text(student_data):
+            logger.info(
+                f"No answer text for {self.student_name} (Q{self.question_number}); "
+                "awarding zero without calling the grader"
+            )
+            return self._zero_grades(questions_data)
+
         # Route to holistic grading when no marking criteria exist.
         if self._holistic_grading:
             return self._run_holistic_grading(student_data, model_data, questions_data)
 
         student_text = self._format_student_for_prompt(student_data)
         self._student_text_last_run = student_text or ""
-        # Use compact JSON to reduce prompt/token bloat.
-        # (This can materially reduce latency/cost on large rubrics.)
-        compact_json_kwargs = {"ensure_ascii": False, "separators": (",", ":")}
-
         # Store the raw payload blobs so downstream guardrails can detect evidence that
         # originates from the question / marking guide rather than student work.
-        try:
-            self._question_text_last_run = json.dumps(questions_data, **compact_json_kwargs)
-        except Exception:
-            self._question_text_last_run = str(questions_data)
-        try:
-            self._model_text_last_run = json.dumps(model_data, **compact_json_kwargs)
-        except Exception:
-            self._model_text_last_run = str(model_data)
+        self._question_text_last_run, questions_json = self._serialize_payload("questions", questions_data)
+        self._model_text_last_run, model_json = self._serialize_payload("model_data", model_data)
 
         payload = {
-            "model_data": json.dumps(model_data, **compact_json_kwargs),
+            "model_data": model_json,
             "chunks": student_text,
-            "questions": json.dumps(questions_data, **compact_json_kwargs),
+            "questions": questions_json,
         }
 
         debug_enabled = os.getenv("DEBUG_SAVE_LLM_OUTPUT", "").strip().lower() in {"1", "true", "yes", "y"}
@@ -3078,10 +3332,10 @@ class StudentGrader:
             s = s.replace("\u00a0", " ")
             s = s.replace("×", "x")
             s = s.replace("–", "-").replace("—", "-")
-            s = re.sub(r"\s+", " ", s).strip().lower()
+            s = _WHITESPACE_RE.sub(" ", s).strip().lower()
             # Remove most punctuation while keeping separators meaningful for ratios.
-            s = re.sub(r"[^a-z0-9%/().,\- ]+", " ", s)
-            s = re.sub(r"\s+", " ", s).strip()
+            s = _EVIDENCE_NOISE_RE.sub(" ", s)
+            s = _WHITESPACE_RE.sub(" ", s).strip()
             return s
 
         def _is_distinctive_short_evidence(ev_norm: str) -> bool:
@@ -3145,7 +3399,7 @@ class StudentGrader:
             if not json_text:
                 raise GradingError("Empty grading output")
             try:
-                return json.loads(json_text)
+                return self._loads_lenient_json(json_text)
             except Exception as je:
                 raise GradingError(f"Invalid JSON from grader: {je}") from je
 
@@ -3154,12 +3408,18 @@ class StudentGrader:
             if self.grade_chain_structured is not None:
                 output = self.grade_chain_structured.invoke(payload)
                 _capture_debug("structured", "received", output_obj=output)
-                parsed = _coerce_to_dict(output)
-                _capture_debug("structured", "parsed", raw_text=json.dumps(parsed, ensure_ascii=False)[:debug_max_chars] if debug_enabled else None)
-                # Validate schema
-                validated = LLMGradingResponse(**parsed)
+                if isinstance(output, LLMGradingResponse):
+                    # Already validated by with_structured_output; dump once
+                    # instead of dump → re-validate → dump.
+                    result = output.model_dump()
+                    _capture_debug("structured", "parsed", raw_text=json.dumps(result, ensure_ascii=False)[:debug_max_chars] if debug_enabled else None)
+                else:
+                    parsed = _coerce_to_dict(output)
+                    _capture_debug("structured", "parsed", raw_text=json.dumps(parsed, ensure_ascii=False)[:debug_max_chars] if debug_enabled else None)
+                    # Validate schema
+                    result = LLMGradingResponse(**parsed).model_dump()
+                self.grade_chain_structured.commit(output)
                 logger.info(f"Grading complete → {self.student_name} (Q{self.question_number}) [structured]")
-                result = validated.model_dump()
                 # Guardrail: evidence must be a verbatim quote that exists in the student text.
                 try:
                     for g in result.get("grades", []) or []:
@@ -3180,12 +3440,14 @@ class StudentGrader:
             logger.warning(f"Structured grading failed; falling back to text parsing: {e}")
 
         # Attempt 2: text output + parse
+        text_output = None
         try:
-            output = self.grade_chain_text.invoke(payload)
+            output = text_output = self.grade_chain_text.invoke(payload)
             _capture_debug("text", "received", output_obj=output)
             parsed = _coerce_to_dict(output)
             _capture_debug("text", "parsed", raw_text=json.dumps(parsed, ensure_ascii=False)[:debug_max_chars] if debug_enabled else None)
             validated = LLMGradingResponse(**parsed)
+            self.grade_chain_text.commit(output)
             logger.info(f"Grading complete → {self.student_name} (Q{self.question_number}) [text]")
             result = validated.model_dump()
             try:
@@ -3205,12 +3467,15 @@ class StudentGrader:
             _capture_debug("text", "error", output_obj=locals().get("output"), error=e)
             logger.warning(f"Text grading parse failed; attempting one JSON repair pass: {e}")
 
-        # Attempt 3: repair by asking the same model to output strict JSON only
+        # Attempt 3: repair by asking the same model to output strict JSON only.
+        # Only real model output is worth repairing: a prompt holding just an
+        # exception string has no student content and would invite (and
+        # cache) an invented grade.
+        raw_content = getattr(text_output, "content", None)
+        if not raw_content:
+            logger.error("Grading chain failed with no model output to repair")
+            raise GradingError("Grading step failed")
         try:
-            # Get the raw text from the previous output if possible
-            raw_content = getattr(output, "content", None) if "output" in locals() else None
-            raw_content = raw_content if raw_content is not None else str(e)
-
             repair_prompt = (
                 "You MUST return ONLY valid JSON (no markdown, no commentary). "
                 "Fix the following output to match this exact schema:\n"
@@ -3239,14 +3504,15 @@ class StudentGrader:
                 f"{raw_content}"
             )
 
-            fixed = llm_grader.invoke(repair_prompt)
+            fixed = self.grade_repair_chain.invoke(repair_prompt)
             _capture_debug("repair", "received", output_obj=fixed)
             fixed_content = getattr(fixed, "content", None)
             fixed_content = fixed_content if fixed_content is not None else str(fixed)
             fixed_json = self._extract_json_from_text(str(fixed_content))
-            parsed = json.loads(fixed_json)
+            parsed = self._loads_lenient_json(fixed_json)
             _capture_debug("repair", "parsed", raw_text=json.dumps(parsed, ensure_ascii=False)[:debug_max_chars] if debug_enabled else None)
             validated = LLMGradingResponse(**parsed)
+            self.grade_repair_chain.commit(fixed)
             logger.info(f"Grading complete → {self.student_name} (Q{self.question_number}) [repaired]")
             result = validated.model_dump()
             try:
@@ -3834,7 +4100,7 @@ class StudentGrader:
             # without being overly permissive.
             if 2 <= len(ev_words) <= 3 and bool(re.search(r"\d{3,}", ev_blob)):
                 crit_nums_raw = re.findall(r"\d[\d,]*\.?\d*", crit_norm)
-                ev_blob_compact = ev_blob.replace(",", "").replace(" ", "")
+                ev_blob_compact = ev_blob.translate(_NUM_STRIP_TABLE)
                 for cn in crit_nums_raw:
                     cn_stripped = cn.replace(",", "")
                     if len(cn_stripped) >= 3 and cn_stripped in ev_blob_compact:
@@ -4825,6 +5091,8 @@ def grade_student(
     model_answers_id: Optional[str],
     student_answers_id: str,
     question_type: str = "numerical",
+    session: Optional[GradingSession] = None,
+    refresh_cache: bool = False,
 ) -> Optional[str]:
     grader = StudentGrader(
         student_name=student_name,
@@ -4833,5 +5101,24 @@ def grade_student(
         model_answers_id=model_answers_id,
         student_answers_id=student_answers_id,
         question_type=question_type,
+        session=session,
+        refresh_cache=refresh_cache,
+    )
+    return grader.grade()
+
+
+def prepare_grading_session(
+    questions_id: Optional[str],
+    model_answers_id: Optional[str],
+) -> GradingSession:
+    """Fetch the question paper and model answer once for a batch of students."""
+    return GradingSession(
+        questions_id=questions_id,
+        model_answers_id=model_answers_id,
+        questions_doc=StudentGrader._fetch_doc(
+            "pac_questions", questions_id, StudentGrader.QUESTION_FIELDS,
+        ) if questions_id else {},
+        model_doc=StudentGrader._fetch_doc(
+            "model_answers", model_answers_id, StudentGrader.MODEL_FIELDS,
+        ) if model_answers_id else {},
     )
-    return grader.grade()
\ No newline at end of file
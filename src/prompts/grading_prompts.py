@@ -1,5 +1,26 @@
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 
+from llm_setup import GRADING_PROVIDER
+
+
+def _static_system_message(template: str):
+    """from_messages() entry for a variable-free system *template*.
+
+    Anthropic only caches a prompt prefix up to an explicit cache_control
+    breakpoint, so there the instructions are sent as a literal content block
+    marked ephemeral; every later student in the cache window pays only for
+    the per-run inputs.  Other providers cache prefixes automatically and get
+    the plain template.
+    """
+    if GRADING_PROVIDER in ("anthropic", "claude"):
+        return SystemMessage(content=[{
+            "type": "text",
+            "text": template.format(),  # unescape {{ }} — no template variables here
+            "cache_control": {"type": "ephemeral"},
+        }])
+    return ("system", template)
+
 GRADE_PROMPT_TEMPLATE = """
 You are an experienced exam marker. Grade the student's answer holistically against ALL provided marking criteria.
 
@@ -9,7 +30,7 @@ Evaluate the ENTIRE student answer (all parts/pages) as one continuous document
 ═══════════════════════════════════════════════════
 STEP 1 — READ THE WHOLE ANSWER FIRST
 ═══════════════════════════════════════════════════
-Before scoring anything, read the ENTIRE {chunks} from start to finish and mentally note:
+Before scoring anything, read the ENTIRE STUDENT'S COMPLETE ANSWER from start to finish and mentally note:
 • Every distinct point, working, calculation, and journal entry the student made.
 • Which parts of the answer address each topic area in the marking criteria.
 This prevents missing credit that is given in a different sub-part or on a different page.
@@ -112,7 +133,7 @@ EVIDENCE RULES
 ═══════════════════════════════════════════════════
 Grading is by MEANING; evidence is for PDF annotation only.
 
-• Evidence MUST be copied verbatim (character-for-character) from {chunks}.
+• Evidence MUST be copied verbatim (character-for-character) from the STUDENT'S COMPLETE ANSWER.
 • One contiguous line / row per snippet (do NOT join distant lines).
 • Choose snippets with DISTINCTIVE tokens: specific numbers (3,125,000 / 9/12), account names (Goodwill, NCI, OCI, Revaluation surplus), or unique phrases.
 • Very short evidence is OK only when it includes a distinctive numeric token or ratio (e.g. "9/12", "£630,000", "25%").
@@ -162,21 +183,6 @@ Rules:
 • Borderline / weakly relevant content → leave it out. Only flag CLEARLY off-topic.
 • If the student is on-topic throughout, return an empty list.
 
-═══════════════════════════════════════════════════
-QUESTION INFORMATION
-═══════════════════════════════════════════════════
-{questions}
-
-═══════════════════════════════════════════════════
-MODEL ANSWERS AND MARKING CRITERIA
-═══════════════════════════════════════════════════
-{model_data}
-
-═══════════════════════════════════════════════════
-STUDENT'S COMPLETE ANSWER
-═══════════════════════════════════════════════════
-{chunks}
-
 ═══════════════════════════════════════════════════
 COMMENTS (annotation-friendly format)
 ═══════════════════════════════════════════════════
@@ -197,7 +203,7 @@ STRICT QUOTA — ONE comment per major sub-section, AT MOST.
 The comment should explain what the student got wrong or missed in that sub-section overall, giving the student a clear understanding of the gap.
 
 Rules:
-• The quote MUST be copied character-for-character from {chunks}.
+• The quote MUST be copied character-for-character from the STUDENT'S COMPLETE ANSWER.
 • Do NOT mention page numbers, line numbers, or "above/below".
 • After the arrow (→): EXACTLY TWO short sentences — Sentence 1: state the issue; Sentence 2: give one actionable improvement.
 • No praise-only comments. Do NOT reveal or reference the model answer.
@@ -237,7 +243,30 @@ OUTPUT FORMAT — return ONLY this valid JSON, nothing else
 """
 
 
-grade_prompt = ChatPromptTemplate.from_template(GRADE_PROMPT_TEMPLATE)
+# Per-run inputs go last, in their own message, so the instruction block above
+# is an identical prefix on every call and provider-side prompt caching can
+# reuse it.
+GRADE_PROMPT_INPUTS_TEMPLATE = """
+═══════════════════════════════════════════════════
+QUESTION INFORMATION
+═══════════════════════════════════════════════════
+{questions}
+
+═══════════════════════════════════════════════════
+MODEL ANSWERS AND MARKING CRITERIA
+═══════════════════════════════════════════════════
+{model_data}
+
+═══════════════════════════════════════════════════
+STUDENT'S COMPLETE ANSWER
+═══════════════════════════════════════════════════
+{chunks}
+"""
+
+grade_prompt = ChatPromptTemplate.from_messages([
+    _static_system_message(GRADE_PROMPT_TEMPLATE),
+    ("human", GRADE_PROMPT_INPUTS_TEMPLATE),
+])
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -710,21 +739,6 @@ Rules:
 • Borderline / weakly relevant content → leave it out. Only flag CLEARLY off-topic.
 • If the student is on-topic throughout, return an empty list.
 
-═══════════════════════════════════════════════════
-QUESTION INFORMATION
-═══════════════════════════════════════════════════
-{questions}
-
-═══════════════════════════════════════════════════
-MODEL ANSWER
-═══════════════════════════════════════════════════
-{model_data}
-
-═══════════════════════════════════════════════════
-STUDENT'S ANSWER
-═══════════════════════════════════════════════════
-{chunks}
-
 ═══════════════════════════════════════════════════
 COMMENTS
 ═══════════════════════════════════════════════════
@@ -744,11 +758,11 @@ where the student never sees it.
 
 • 3-5 words ONLY. Longer phrases (6+ words) often span PDF lines and the
   exact-match search fails. Pick the SHORTEST distinctive slice you can.
-• MUST be a character-for-character verbatim substring of {chunks}. Copy
+• MUST be a character-for-character verbatim substring of the STUDENT'S ANSWER. Copy
   exactly — preserve typos ("hsould", "biith", "specipitcal"), preserve
   punctuation, preserve casing. If you paraphrase or "clean up" the spelling,
   the search will not find the anchor in the PDF.
-• MUST come from a single line in {chunks} — never join words across lines.
+• MUST come from a single line in the STUDENT'S ANSWER — never join words across lines.
 • MUST be from the SAME sub-question as the prefix. A `[4.3]` comment cannot
   anchor on a phrase the student wrote under 4.4.
 • If you can't find a distinctive 3-5 word phrase, pick the first 3-4 words
@@ -807,7 +821,27 @@ Constraints:
 • marks_awarded = count of correct_points × 0.5 (capped at max_marks).
 • score = sum of all marks_awarded (capped at total_marks).
 • Every correct_point has marks: 0.5. Every key_phrase is 3-6 words.
-• student_label must be verbatim from {chunks} or empty string.
+• student_label must be verbatim from the STUDENT'S ANSWER or empty string.
+"""
+
+HOLISTIC_GRADE_PROMPT_INPUTS_TEMPLATE = """
+═══════════════════════════════════════════════════
+QUESTION INFORMATION
+═══════════════════════════════════════════════════
+{questions}
+
+═══════════════════════════════════════════════════
+MODEL ANSWER
+═══════════════════════════════════════════════════
+{model_data}
+
+═══════════════════════════════════════════════════
+STUDENT'S ANSWER
+═══════════════════════════════════════════════════
+{chunks}
 """
 
-holistic_grade_prompt = ChatPromptTemplate.from_template(HOLISTIC_GRADE_PROMPT_TEMPLATE)
+holistic_grade_prompt = ChatPromptTemplate.from_messages([
+    _static_system_message(HOLISTIC_GRADE_PROMPT_TEMPLATE),
+    ("human", HOLISTIC_GRADE_PROMPT_INPUTS_TEMPLATE),
+])
@@ -1,7 +1,13 @@
+import atexit
 import base64
+import functools
+import hashlib
 import os
 import re
-from typing import Any, Dict, List, Tuple, Type
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 import fitz
 from dotenv import load_dotenv
@@ -12,17 +18,56 @@ from logging_config import logger
 from llm_setup import _build_chat_model
 from errors.exceptions import PDFExtractionError
 from errors.classifier import classify_error
+from utils.llm_cache import (
+    LLM_CACHE_ENABLED, cache_key, cache_get, cache_set, cache_get_bytes, cache_set_bytes,
+)
+from utils.mupdf_lock import MUPDF_LOCK
 
 load_dotenv()
 
+# C0/C1 control characters except \t, \n and \r, deleted via str.translate.
+_CONTROL_CHARS_TABLE = dict.fromkeys(
+    [*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), *range(0x7F, 0xA0)]
+)
+# Runs of 3+ spaces collapse to two, 3+ newlines to one blank line; both
+# rules in one pass over the text.
+_WHITESPACE_RUN_RE = re.compile(r'( {3,})|\n{3,}')
+
+
+def _collapse_whitespace_run(m: re.Match) -> str:
+    return '  ' if m.group(1) else '\n\n'
+
+# Rendering fewer pages than this stays in-process; a pool costs more to
+# start than it saves.
+_PARALLEL_RENDER_MIN_PAGES = 3
+_NUM_RENDER_WORKERS = min(os.cpu_count() or 1, 4)
+# Documents each pool worker keeps open between calls.
+_WORKER_MAX_OPEN_DOCS = 4
+
+# Render pool shared by every extraction in this process.  Created on first
+# use so importing the module (e.g. in Streamlit) never spawns processes.
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+# In-memory LRU of rendered pages, keyed by (path, mtime, size, page, dpi),
+# in front of the on-disk render cache: a student whose pages are shared by
+# several questions is rendered (or read back from disk) once per process.
+_RENDER_MEMO_MAX_PAGES = 64
+_render_memo: "OrderedDict[tuple, str]" = OrderedDict()
+_render_memo_lock = threading.Lock()
+
+# Per-worker-process cache of open Documents, keyed by (path, mtime, size) so
+# a file replaced at the same path is reopened.  None outside pool workers.
+_worker_docs: Optional["OrderedDict[tuple, fitz.Document]"] = None
+
 
 def clean_text(text: str) -> str:
     if not isinstance(text, str):
         return text
 
-    cleaned = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F-\x9F]', '', text)
-    cleaned = re.sub(r' {3,}', '  ', cleaned)
-    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    cleaned = text.translate(_CONTROL_CHARS_TABLE)
+    if '   ' in cleaned or '\n\n\n' in cleaned:
+        cleaned = _WHITESPACE_RUN_RE.sub(_collapse_whitespace_run, cleaned)
     lines = [line.rstrip() for line in cleaned.split('\n')]
     return '\n'.join(lines).strip()
 
@@ -38,43 +83,196 @@ def clean_dict_values(data: Any) -> Any:
     return data
 
 
+def _render_worker_init() -> None:
+    """Pool initializer: enable the per-process open-Document cache."""
+    global _worker_docs
+    _worker_docs = OrderedDict()
+
+
+def _worker_doc(pdf_path: str) -> "fitz.Document":
+    """Return an open Document for *pdf_path* from this worker's LRU cache."""
+    st = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size)
+    doc = _worker_docs.get(key)
+    if doc is not None:
+        _worker_docs.move_to_end(key)
+        return doc
+    doc = fitz.open(pdf_path)
+    _worker_docs[key] = doc
+    while len(_worker_docs) > _WORKER_MAX_OPEN_DOCS:
+        _worker_docs.popitem(last=False)[1].close()
+    return doc
+
+
+def _render_doc_pages(doc, page_nums: List[int], render_dpi: int) -> List[Tuple[int, str]]:
+    out: List[Tuple[int, str]] = []
+    zoom = render_dpi / 72.0
+    matrix = fitz.Matrix(zoom, zoom)
+    for page_num in page_nums:
+        if not (1 <= page_num <= len(doc)):
+            continue
+        pix = doc[page_num - 1].get_pixmap(matrix=matrix, alpha=False)
+        image_bytes = pix.tobytes("jpeg", jpg_quality=90)
+        out.append((page_num, base64.b64encode(image_bytes).decode("utf-8")))
+    return out
+
+
+def _render_pages_worker(pdf_path: str, page_nums: List[int], render_dpi: int) -> List[Tuple[int, str]]:
+    """Render *page_nums* (1-based) of *pdf_path* to base64 JPEGs.
+
+    Top-level so it can run in a worker process.  Pool workers reuse an
+    already-open Document; in-process calls open and close their own under
+    MUPDF_LOCK, since other threads may be annotating or rendering too.
+    Out-of-range pages are skipped.
+    """
+    if _worker_docs is not None:
+        return _render_doc_pages(_worker_doc(pdf_path), page_nums, render_dpi)
+    with MUPDF_LOCK, fitz.open(pdf_path) as doc:
+        return _render_doc_pages(doc, page_nums, render_dpi)
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Return the shared render pool, starting it on first use."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=_NUM_RENDER_WORKERS, initializer=_render_worker_init,
+            )
+            atexit.register(_render_pool.shutdown, wait=False, cancel_futures=True)
+        return _render_pool
+
+
+def _reset_render_pool() -> None:
+    """Drop a broken render pool so the next call starts a fresh one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+@functools.lru_cache(maxsize=None)
+def _chat_model(provider: str, model_name: str):
+    """Chat model for (*provider*, *model_name*), built once per process."""
+    return _build_chat_model(provider, model_name, temperature=0)
+
+
+@functools.lru_cache(maxsize=None)
+def _structured_chat_model(provider: str, model_name: str, schema: Type[BaseModel]):
+    """_chat_model() bound to *schema* via the provider's native structured output."""
+    return _chat_model(provider, model_name).with_structured_output(schema)
+
+
+def _file_digest(path: str) -> str:
+    """blake2b hex digest of the file at *path* (keys the page render cache)."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
 class PDFExtractor:
-    def __init__(self, pdf_path: str, pages: List[int], model_name: str, render_dpi: int = 220):
+    def __init__(
+        self,
+        pdf_path: str,
+        pages: List[int],
+        model_name: str,
+        render_dpi: int = 220,
+        refresh_cache: bool = False,
+    ):
         self.pdf_path = pdf_path
         self.pages = pages
         self.model_name = model_name
         self.render_dpi = render_dpi
+        # Skip the extraction-result cache lookup (a forced re-grade).
+        self.refresh_cache = refresh_cache
+        self.provider = (os.getenv("LLM_PROVIDER") or "").strip().lower()
+        if not self.provider or self.provider == "auto":
+            self.provider = "openai"
         self.llm = self._get_llm()
 
     def _get_llm(self):
-        provider = (os.getenv("LLM_PROVIDER") or "").strip().lower()
-        if not provider or provider == "auto":
-            provider = "openai"
+        provider = self.provider
         try:
             logger.info(f"Using {provider} provider via LangChain (model={self.model_name}, dpi={self.render_dpi})")
-            return _build_chat_model(provider, self.model_name, temperature=0)
+            return _chat_model(provider, self.model_name)
         except Exception as e:
             clean_msg, show_tb = classify_error(e)
             logger.error(f"LLM initialisation failed: {clean_msg}", exc_info=show_tb)
             raise PDFExtractionError(f"LLM initialisation failed: {clean_msg}") from e
 
     def _render_pages_as_base64(self) -> List[Tuple[int, str]]:
-        base64_images: List[Tuple[int, str]] = []
-        doc = fitz.open(self.pdf_path)
+        """Render self.pages, reusing pages already rendered in this process."""
+        try:
+            st = os.stat(self.pdf_path)
+        except OSError:
+            return self._render_pages_disk_cached(self.pages)
+
+        file_id = (os.path.abspath(self.pdf_path), st.st_mtime_ns, st.st_size)
+        keys = {n: (*file_id, n, self.render_dpi) for n in self.pages}
+        images: Dict[int, str] = {}
+        with _render_memo_lock:
+            for n, key in keys.items():
+                img = _render_memo.get(key)
+                if img is not None:
+                    _render_memo.move_to_end(key)
+                    images[n] = img
+
+        missing = [n for n in keys if n not in images]
+        if missing:
+            fresh = self._render_pages_disk_cached(missing)
+            with _render_memo_lock:
+                for page_num, img in fresh:
+                    _render_memo[keys[page_num]] = img
+                    images[page_num] = img
+                while len(_render_memo) > _RENDER_MEMO_MAX_PAGES:
+                    _render_memo.popitem(last=False)
+        return [(n, images[n]) for n in self.pages if n in images]
+
+    def _render_pages_disk_cached(self, pages: List[int]) -> List[Tuple[int, str]]:
+        """Render *pages*, reusing cached JPEGs keyed by (file digest, page, dpi)."""
+        if not LLM_CACHE_ENABLED:
+            return self._render_pages(pages)
         try:
-            zoom = self.render_dpi / 72.0
-            matrix = fitz.Matrix(zoom, zoom)
-            for page_num in self.pages:
-                if not (1 <= page_num <= len(doc)):
-                    continue
-                page = doc[page_num - 1]
-                pix = page.get_pixmap(matrix=matrix, alpha=False)
-                image_bytes = pix.tobytes("jpeg", jpg_quality=90)
-                encoded = base64.b64encode(image_bytes).decode("utf-8")
-                base64_images.append((page_num, encoded))
-            return base64_images
-        finally:
-            doc.close()
+            digest = _file_digest(self.pdf_path)
+        except OSError:
+            return self._render_pages(pages)
+
+        # Pages are stored as raw JPEG bytes (not pickled, ~25% smaller than base64).
+        keys = {n: cache_key(f"render:{digest}", [n, self.render_dpi]) for n in pages}
+        images: Dict[int, str] = {}
+        for n, key in keys.items():
+            jpeg = cache_get_bytes(key)
+            if jpeg is not None:
+                images[n] = base64.b64encode(jpeg).decode("ascii")
+        missing = [n for n in keys if n not in images]
+        if missing:
+            for page_num, img in self._render_pages(missing):
+                cache_set_bytes(keys[page_num], base64.b64decode(img))
+                images[page_num] = img
+        else:
+            logger.info(f"Render cache hit for all {len(images)} page(s) of {self.pdf_path}")
+        return [(n, images[n]) for n in pages if n in images]
+
+    def _render_pages(self, pages: List[int]) -> List[Tuple[int, str]]:
+        workers = min(_NUM_RENDER_WORKERS, len(pages))
+        if len(pages) < _PARALLEL_RENDER_MIN_PAGES or workers < 2:
+            return _render_pages_worker(self.pdf_path, pages, self.render_dpi)
+
+        # Rasterising and JPEG-encoding run in MuPDF's C code, so pages are
+        # split across the warm worker pool; each chunk keeps the caller's
+        # page order.
+        chunk = -(-len(pages) // workers)
+        chunks = [pages[i:i + chunk] for i in range(0, len(pages), chunk)]
+        try:
+            results = _get_render_pool().map(
+                _render_pages_worker,
+                [self.pdf_path] * len(chunks), chunks, [self.render_dpi] * len(chunks),
+            )
+            return [item for part in results for item in part]
+        except Exception as e:
+            logger.warning(f"Parallel page rendering failed, rendering in-process: {e}")
+            _reset_render_pool()
+            return _render_pages_worker(self.pdf_path, pages, self.render_dpi)
 
     def extract(
         self,
@@ -86,7 +284,24 @@ class PDFExtractor:
             if not rendered_pages:
                 raise PDFExtractionError("No pages rendered from PDF")
 
-            structured_llm = self.llm.with_structured_output(output_schema)
+            # Re-extracting the same pages (e.g. re-grading a student) sends
+            # identical images and prompt; reuse the cleaned result.
+            key = cache_key(
+                f"extract:{self.model_name}",
+                [
+                    instruction_prompt,
+                    output_schema.__name__,
+                    [(n, hashlib.sha256(img.encode("ascii")).hexdigest()) for n, img in rendered_pages],
+                ],
+                getattr(self.llm, "temperature", None),
+            )
+            if LLM_CACHE_ENABLED and not self.refresh_cache:
+                cached = cache_get(key)
+                if cached is not None:
+                    logger.info(f"Extraction cache hit for {self.pdf_path} ({key[:12]})")
+                    return cached
+
+            structured_llm = _structured_chat_model(self.provider, self.model_name, output_schema)
 
             content = [{"type": "text", "text": instruction_prompt}]
             for page_num, img_base64 in rendered_pages:
@@ -103,7 +318,10 @@ class PDFExtractor:
 
             data = response.model_dump() if isinstance(response, BaseModel) else response
             logger.info(f"Successfully extracted from {self.pdf_path}")
-            return clean_dict_values(data)
+            cleaned = clean_dict_values(data)
+            if LLM_CACHE_ENABLED:
+                cache_set(key, cleaned)
+            return cleaned
 
         except PDFExtractionError:
             raise
@@ -0,0 +1,238 @@
+"""On-disk cache for deterministic LLM chain calls.
+
+Re-grading the same student against the same model answer sends
+byte-identical prompts.  CachedRunnable keys each call on (model, rendered
+messages, the model's temperature) and, once the caller has validated the
+chain's output, stores it under LLM_CACHE_DIR so repeats skip the provider
+round trip.
+Message text is whitespace-normalised for the key, so re-extractions that
+differ only in spacing or line breaks still hit.
+
+Expired entries are deleted when read, and the directory is pruned
+(oldest first) whenever it grows past LLM_CACHE_MAX_MB.  Raw bytes (e.g.
+rendered page JPEGs) go through cache_get_bytes/cache_set_bytes and are
+stored as-is, not pickled.
+
+Controlled by env:
+  LLM_CACHE=0                  disable caching
+  LLM_CACHE_DIR=llm_cache      cache directory (relative paths resolve
+                               against the project root, not the cwd)
+  LLM_CACHE_TTL_SECONDS=604800 entry lifetime (default 7 days)
+  LLM_CACHE_MAX_MB=2048        size bound for the whole directory
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from logging_config import logger
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1").strip().lower() not in {"0", "false", "no", "n"}
+LLM_CACHE_DIR = os.path.join(
+    _PROJECT_ROOT, os.getenv("LLM_CACHE_DIR", "llm_cache").strip() or "llm_cache"
+)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Running estimate of the directory size; the first write measures it.
+_size_lock = threading.Lock()
+_size_estimate: Optional[int] = None
+
+
+def cache_key(model: str, messages: Any, temperature: float = 0, tools: Any = None) -> str:
+    """Return a SHA-256 hex key for one LLM call."""
+    blob = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "tools": tools},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def normalize_for_key(text: Any) -> Any:
+    """Collapse whitespace runs in *text* for cache keying; non-strings pass through."""
+    if isinstance(text, str):
+        return " ".join(text.split())
+    return text
+
+
+def _path_for(key: str, ext: str = ".pkl") -> str:
+    return os.path.join(LLM_CACHE_DIR, key[:2], f"{key}{ext}")
+
+
+def _read(key: str, ext: str) -> Optional[bytes]:
+    """Return the stored bytes for *key*; an expired entry is deleted and reads as a miss."""
+    path = _path_for(key, ext)
+    try:
+        if time.time() - os.path.getmtime(path) > LLM_CACHE_TTL_SECONDS:
+            os.remove(path)
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"LLM cache read failed for {key[:12]}: {e}")
+        return None
+
+
+def _prune() -> int:
+    """Delete expired entries, then oldest ones until under LLM_CACHE_MAX_BYTES; return the size left."""
+    entries = []
+    now = time.time()
+    for root, _dirs, files in os.walk(LLM_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > LLM_CACHE_TTL_SECONDS:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if total > LLM_CACHE_MAX_BYTES:
+        entries.sort()
+        # Trim to 90% of the bound so pruning does not rerun on every write.
+        target = LLM_CACHE_MAX_BYTES * 9 // 10
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        logger.info(f"LLM cache pruned to {total // (1024 * 1024)} MB")
+    return total
+
+
+def _write(key: str, ext: str, data: bytes) -> None:
+    """Store *data* under *key*; written atomically so readers never see a partial file."""
+    global _size_estimate
+    path = _path_for(key, ext)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        tmp = None
+        with _size_lock:
+            if _size_estimate is None or _size_estimate + len(data) > LLM_CACHE_MAX_BYTES:
+                _size_estimate = _prune()
+            else:
+                _size_estimate += len(data)
+    except Exception as e:
+        logger.debug(f"LLM cache write failed for {key[:12]}: {e}")
+    finally:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the cached value for *key*, or None when missing or expired."""
+    data = _read(key, ".pkl")
+    if data is None:
+        return None
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        logger.debug(f"LLM cache entry unreadable for {key[:12]}: {e}")
+        return None
+
+
+def cache_set(key: str, value: Any) -> None:
+    """Store *value* (pickled) under *key*."""
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        logger.debug(f"LLM cache value not picklable for {key[:12]}: {e}")
+        return
+    _write(key, ".pkl", data)
+
+
+def cache_get_bytes(key: str) -> Optional[bytes]:
+    """Return raw bytes stored by cache_set_bytes(), or None when missing or expired."""
+    return _read(key, ".bin")
+
+
+def cache_set_bytes(key: str, data: bytes) -> None:
+    """Store raw *data* under *key* without pickling."""
+    _write(key, ".bin", data)
+
+
+class CachedRunnable:
+    """Wrap a ``prompt | llm`` chain so identical invocations hit the disk cache.
+
+    *prompt* is the chain's ChatPromptTemplate; it renders the payload into
+    the exact messages sent, which (with *model*, *namespace* and
+    *temperature*) form the key.  With prompt=None the payload is itself the
+    prompt (a plain string sent straight to the model).  *namespace* separates chains that share a
+    prompt but parse output differently (e.g. structured vs. plain text).
+
+    invoke() never stores a fresh output itself: the caller passes it to
+    commit() once it has parsed and validated, so a malformed response is
+    not replayed.  With *refresh* the lookup is skipped (a forced re-grade)
+    and the validated answer replaces any cached one.
+    """
+
+    def __init__(
+        self,
+        chain: Any,
+        prompt: Any,
+        model: str,
+        namespace: str,
+        temperature: Optional[float] = None,
+        refresh: bool = False,
+    ):
+        self.chain = chain
+        self.prompt = prompt
+        self.model = model
+        self.namespace = namespace
+        self.temperature = temperature
+        self.refresh = refresh
+        self._pending: Optional[tuple[str, Any]] = None
+
+    def _key(self, payload: Any) -> str:
+        if self.prompt is None:
+            messages = normalize_for_key(payload)
+        else:
+            messages = [
+                (m.type, normalize_for_key(m.content))
+                for m in self.prompt.format_messages(**payload)
+            ]
+        return cache_key(f"{self.namespace}:{self.model}", messages, self.temperature)
+
+    def invoke(self, payload: Any) -> Any:
+        self._pending = None
+        if not LLM_CACHE_ENABLED:
+            return self.chain.invoke(payload)
+        key = self._key(payload)
+        if not self.refresh:
+            cached = cache_get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({self.namespace}, {key[:12]})")
+                return cached
+        output = self.chain.invoke(payload)
+        self._pending = (key, output)
+        return output
+
+    def commit(self, output: Any) -> None:
+        """Store *output* if it is the fresh result of the last invoke()."""
+        pending, self._pending = self._pending, None
+        if pending is not None and pending[1] is output:
+            cache_set(pending[0], output)
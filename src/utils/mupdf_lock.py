@@ -0,0 +1,11 @@
+"""Process-wide lock for PyMuPDF.
+
+MuPDF keeps global state and is not thread-safe, so every in-process
+fitz call made from a thread that may run alongside others (executor
+threads under asyncio.gather, batch thread pools) holds MUPDF_LOCK.
+Work sent to the render process pool runs in its own process and does
+not need it.
+"""
+import threading
+
+MUPDF_LOCK = threading.RLock()